@@ -1,44 +1,88 @@
 import os
 import sys
+import time
+import asyncio
 import tempfile
 import logging
 from pathlib import Path
+from typing import Optional, Set
+from uuid import uuid4
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Depends
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from mangum import Mangum
 from contextlib import asynccontextmanager
 
+# Gunakan uvloop (libuv) sebagai event loop bila tersedia; tidak ada di Windows
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 # --- Konfigurasi Path dan Logging ---
 # Tambahkan root directory ke sys.path agar bisa impor 'src'
 try:
     APP_ROOT = Path(__file__).parent
     sys.path.insert(0, str(APP_ROOT))
     
-    if 'src' not in [p.name for p in APP_ROOT.iterdir()]:
-        APP_ROOT = Path(__file__).parent.parent
+    if not (APP_ROOT / 'src').is_dir():
+        APP_ROOT = APP_ROOT.parent
         sys.path.insert(0, str(APP_ROOT))
 
-    load_dotenv(APP_ROOT / '.env')
+    # Di Vercel env sudah diset oleh platform, .env hanya untuk lokal
+    if not os.getenv("SUPABASE_URL"):
+        load_dotenv(APP_ROOT / '.env')
     
     # Impor modul Anda SETELAH sys.path diatur
     from main import LegalComplaintProcessor
     from src.database import DatabaseManager
-    from src.ai_analyzer import LegalAIAnalyzer
+    from src.ai_analyzer import LegalAIAnalyzer, AsyncBatcher
+    from utils.helpers import sanitize_filename
     
 except ImportError as e:
     logging.fatal(f"FATAL: Gagal impor modul. Pastikan struktur file benar. Error: {e}")
     sys.exit(1) # Keluar jika impor dasar gagal
 
-# Inisialisasi logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+# Inisialisasi logging (atur lewat LOG_LEVEL, mis. DEBUG untuk melihat tiap langkah pipeline)
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
 logger = logging.getLogger(__name__)
 
+# Batas upload: file dibaca per 1 MB, maksimal MAX_UPLOAD_MB (default 20 MB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+
+# Batas waktu tunggu upload ke Supabase Storage sebelum respons dikirim
+STORAGE_UPLOAD_TIMEOUT = 15
+
+# Status complaint yang analisisnya sudah selesai dan tersimpan
+ANALYZED_STATUSES = ('analyzed', 'validated')
+
+# Batas waktu warmup dependensi saat startup
+WARMUP_TIMEOUT = 10
+
+# File upload disimpan di tmpfs (/dev/shm, berbasis RAM) bila tersedia;
+# Vercel hanya mengizinkan penulisan ke /tmp
+TEMP_DIR = "/dev/shm" if os.access("/dev/shm", os.W_OK) else "/tmp"
+
+# Panjang maksimal nama file client di nama file sementara; 50 karakter
+# (paling banyak 4 byte UTF-8 per karakter) tetap di bawah NAME_MAX 255 byte
+TEMP_NAME_MAX_CHARS = 50
+
 # --- Manajemen Lifespan (Inisialisasi Saat Startup) ---
 
 # Variabel global untuk menyimpan instance prosesor
 app_state = {}
 
+# Task penyelesaian upload Storage yang berjalan setelah respons dikirim;
+# referensinya disimpan agar tidak dibersihkan garbage collector
+_upload_followups: Set[asyncio.Task] = set()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Kode ini berjalan SAAT STARTUP ---
@@ -49,12 +93,28 @@ async def lifespan(app: FastAPI):
         #    Ini akan memicu __init__ dari LegalComplaintProcessor
         #    yang juga akan memicu __init__ dari DatabaseManager dan LegalAIAnalyzer
         logger.info("Menginisialisasi LegalComplaintProcessor...")
+        started = time.perf_counter()
         processor = LegalComplaintProcessor()
         
         # Simpan prosesor di state aplikasi
         app_state["processor"] = processor
         logger.info("LegalComplaintProcessor berhasil diinisialisasi.")
         
+        # Panaskan PDF backend, koneksi Supabase, dan client Gemini sekarang
+        # agar biaya cold start tidak jatuh ke request pertama.
+        # Kegagalan warmup tidak menghentikan server.
+        try:
+            warmup = await asyncio.wait_for(run_in_threadpool(processor.warmup), timeout=WARMUP_TIMEOUT)
+            logger.info(f"Warmup selesai dalam {time.perf_counter() - started:.2f} detik: {warmup}")
+        except asyncio.TimeoutError:
+            logger.warning(f"Warmup melebihi {WARMUP_TIMEOUT} detik, dilanjutkan di background.")
+        
+        # 2. Batcher bersama agar analisis yang datang bersamaan
+        #    dikirim ke Gemini dalam satu batch
+        batcher = AsyncBatcher(processor.ai_analyzer)
+        batcher.start()
+        app_state["batcher"] = batcher
+        
     except ValueError as e:
         # Ini kemungkinan besar adalah error ENV (misal: "Missing credentials")
         logger.error(f"FATAL (ValueError): Gagal inisialisasi. Cek Environment Variables! Error: {e}")
@@ -69,6 +129,13 @@ async def lifespan(app: FastAPI):
     
     # --- Kode ini berjalan SAAT SHUTDOWN (tidak terlalu relevan di Vercel) ---
     logger.info("Server shutdown...")
+    batcher = app_state.get("batcher")
+    if batcher:
+        await batcher.stop()
+    processor = app_state.get("processor")
+    if processor:
+        # Tulis log audit yang masih antre sebelum proses berhenti
+        await run_in_threadpool(processor.db.flush_logs)
     app_state.clear()
 
 
@@ -77,11 +144,141 @@ app = FastAPI(
     title="Legal Complaint Analyzer API",
     description="API untuk menganalisis dokumen laporan pengaduan hukum",
     version="1.0.0",
-    lifespan=lifespan  # Gunakan lifespan manager yang baru
+    lifespan=lifespan,  # Gunakan lifespan manager yang baru
+    default_response_class=ORJSONResponse  # Serialisasi JSON via orjson (C/Rust)
 )
 handler = Mangum(app)
 
 
+# --- Dependencies ---
+
+def get_processor() -> LegalComplaintProcessor:
+    """Ambil instance prosesor yang dibuat sekali saat startup."""
+    processor = app_state.get("processor")
+    
+    if not processor:
+        logger.error("Prosesor tidak terinisialisasi. Endpoint tidak bisa bekerja.")
+        raise HTTPException(
+            status_code=500,
+            detail="Server tidak terkonfigurasi dengan benar (Prosesor gagal). Hubungi administrator."
+        )
+    return processor
+
+
+def _temp_path(filename: str) -> str:
+    """
+    Buat file sementara yang unik untuk upload.
+    
+    Nama file dari client tidak dipakai langsung sebagai path (mencegah
+    path traversal dan bentrok antar upload), hanya versi yang sudah
+    disanitasi sebagai akhiran. Akhiran dipotong dari depan sehingga
+    ekstensinya tetap ada.
+    """
+    safe_name = sanitize_filename(os.path.basename(filename or 'laporan.pdf'))
+    fd, temp_path = tempfile.mkstemp(
+        prefix="upload-",
+        suffix=f"-{safe_name[-TEMP_NAME_MAX_CHARS:]}",
+        dir=TEMP_DIR
+    )
+    os.close(fd)
+    return temp_path
+
+
+class _TempFileStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse yang menghapus file sementara setelah selesai.
+    
+    Penghapusan ada di sini, bukan di generator, karena generator tidak
+    pernah berjalan bila client putus sebelum streaming dimulai.
+    """
+    
+    def __init__(self, content, temp_path: str, **kwargs):
+        super().__init__(content, **kwargs)
+        self.temp_path = temp_path
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            _remove_temp_file(self.temp_path)
+
+
+async def _save_upload(file: UploadFile, temp_path: str) -> None:
+    """
+    Simpan file yang di-upload secara bertahap (per chunk) agar pemakaian
+    memori tidak bergantung pada ukuran PDF.
+    """
+    total_bytes = 0
+    with open(temp_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            total_bytes += len(chunk)
+            if total_bytes > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Ukuran file melebihi batas {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+                )
+            buffer.write(chunk)
+
+
+def _remove_temp_file(temp_path: str) -> None:
+    """Hapus file sementara; kegagalan hanya dicatat."""
+    if os.path.exists(temp_path):
+        try:
+            os.remove(temp_path)
+            logger.info(f"File sementara dihapus: {temp_path}")
+        except Exception as e:
+            logger.error(f"Gagal menghapus file sementara {temp_path}: {e}")
+
+
+def _upload_time_left(deadline: float) -> float:
+    """Sisa waktu tunggu upload Storage (detik, tidak negatif)."""
+    return max(0.0, deadline - time.monotonic())
+
+
+async def _wait_for_upload(upload_task: Optional[asyncio.Task], deadline: float) -> Optional[str]:
+    """Tunggu upload Storage sampai deadline; kegagalan/timeout tidak menggagalkan request."""
+    if upload_task is None:
+        return None
+    try:
+        return await asyncio.wait_for(asyncio.shield(upload_task), timeout=_upload_time_left(deadline))
+    except asyncio.TimeoutError:
+        logger.warning("Upload ke Supabase Storage melebihi batas waktu, pdf_url disimpan setelah selesai.")
+    except Exception as e:
+        logger.error(f"Upload ke Supabase Storage gagal: {e}")
+    return None
+
+
+async def _finish_upload(processor: LegalComplaintProcessor, upload_task: asyncio.Task,
+                         storage_path: str, complaint_id: Optional[str]) -> None:
+    """
+    Tunggu upload Storage yang belum selesai saat respons dikirim.
+    
+    Untuk complaint yang diterima, pdf_url disimpan ke complaint; untuk
+    upload yang ditolak/gagal (complaint_id None), objeknya dihapus agar
+    tidak ada PDF yatim di bucket.
+    """
+    try:
+        pdf_url = await upload_task
+    except Exception as e:
+        logger.error(f"Upload ke Supabase Storage gagal: {e}")
+        return
+    if not pdf_url:
+        return
+    if complaint_id:
+        await run_in_threadpool(processor.db.update_complaint_pdf_url, complaint_id, pdf_url)
+    else:
+        await run_in_threadpool(processor.db.delete_pdf, storage_path)
+        logger.info(f"PDF dari upload yang tidak diterima dihapus dari Storage: {storage_path}")
+
+
+def _follow_up_upload(processor: LegalComplaintProcessor, upload_task: asyncio.Task,
+                      storage_path: str, complaint_id: Optional[str]) -> None:
+    """Jalankan _finish_upload di background tanpa menahan respons."""
+    task = asyncio.create_task(_finish_upload(processor, upload_task, storage_path, complaint_id))
+    _upload_followups.add(task)
+    task.add_done_callback(_upload_followups.discard)
+
+
 # --- Endpoints ---
 
 @app.get("/")
@@ -95,54 +292,97 @@ async def root():
         )
     return {"message": "Legal Complaint Analyzer API Online dan Terkonfigurasi."}
 
-@app.post("/analyze")
-async def analyze_laporan(file: UploadFile = File(...)):
-    """
-    Endpoint utama untuk meng-upload dan menganalisis laporan pengaduan PDF.
+@app.post("/analyze", status_code=202)
+async def analyze_laporan(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    processor: LegalComplaintProcessor = Depends(get_processor)
+):
     """
-    processor = app_state.get("processor")
+    Endpoint utama untuk meng-upload laporan pengaduan PDF.
     
-    if not processor:
-        logger.error("Prosesor tidak terinisialisasi. Endpoint /analyze tidak bisa bekerja.")
-        raise HTTPException(
-            status_code=500,
-            detail="Server tidak terkonfigurasi dengan benar (Prosesor gagal). Hubungi administrator."
-        )
-
-    # Vercel hanya mengizinkan penulisan ke direktori /tmp
-    temp_dir = "/tmp"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_path = os.path.join(temp_dir, file.filename)
+    Ekstraksi teks dan penyimpanan complaint dilakukan langsung, sedangkan
+    analisis AI dijalankan di background. Client memantau hasilnya melalui
+    `GET /analyze/{complaint_id}`.
+    """
+    temp_path = _temp_path(file.filename)
 
     logger.info(f"Menerima file: {file.filename}. Menyimpan ke: {temp_path}")
 
+    upload_task = None
+    upload_deadline = 0.0
+    # Diisi saat complaint diterima; selain itu objek Storage dihapus
+    accepted_id = None
+    pdf_url = None
+
     try:
-        # Simpan file yang di-upload ke /tmp
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        await _save_upload(file, temp_path)
         
         logger.info(f"File berhasil disimpan. Memulai pemrosesan untuk: {temp_path}")
 
-        # Gunakan LegalComplaintProcessor untuk menjalankan alur lengkap
-        result = processor.process_complaint(temp_path, uploaded_by='system-api')
+        # Upload ke Supabase Storage tidak bergantung pada ekstraksi,
+        # jadi dijalankan bersamaan dan baru ditunggu sebelum respons
+        if processor.db.storage_bucket:
+            storage_path = f"complaints/{uuid4().hex}/{sanitize_filename(file.filename)}"
+            upload_task = asyncio.create_task(
+                run_in_threadpool(processor.db.upload_pdf, temp_path, storage_path)
+            )
+            upload_deadline = time.monotonic() + STORAGE_UPLOAD_TIMEOUT
+
+        # Langkah 1-2 (ekstraksi + simpan complaint) dijalankan sekarang,
+        # analisis AI (langkah 3-7) diantrekan ke background.
+        # Ekstraksi dan panggilan Supabase bersifat blocking, jadi dijalankan
+        # di thread agar event loop tetap bebas melayani upload lain.
+        created = await processor.create_complaint_async(
+            temp_path, uploaded_by='system-api',
+            status='queued', pdf_filename=file.filename
+        )
         
-        if not result.get('success'):
-            logger.error(f"Pemrosesan gagal: {result.get('error')}")
+        if created.get('error') == 'unparseable':
+            logger.warning(f"Laporan ditolak (bukan laporan pengaduan / tidak terbaca): {file.filename}")
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "error": "unparseable",
+                    "message": "Teks PDF tidak terbaca atau bukan laporan pengaduan.",
+                    "complaint_id": created.get('complaint_id'),
+                    "complaint_number": created.get('complaint_number')
+                }
+            )
+        
+        if not created.get('success'):
+            logger.error(f"Pemrosesan gagal: {created.get('error')}")
             raise HTTPException(
                 status_code=500,
-                detail=f"Gagal memproses file: {result.get('error')}"
+                detail=f"Gagal memproses file: {created.get('error')}"
             )
 
-        # Jika sukses, kembalikan hasil
-        logger.info(f"Analisis berhasil untuk {file.filename}. Complaint ID: {result.get('complaint_id')}")
-        return JSONResponse(
-            status_code=200,
+        complaint_id = created['complaint_id']
+        background_tasks.add_task(
+            processor.analyze_complaint_async,
+            complaint_id,
+            created['extracted_text'],
+            app_state["batcher"],
+            complaint_number=created['complaint_number']
+        )
+
+        accepted_id = complaint_id
+        pdf_url = await _wait_for_upload(upload_task, upload_deadline)
+        if pdf_url:
+            background_tasks.add_task(processor.db.update_complaint_pdf_url, complaint_id, pdf_url)
+
+        logger.info(f"Analisis diantrekan untuk {file.filename}. Complaint ID: {complaint_id}")
+        return ORJSONResponse(
+            status_code=202,
             content={
                 "success": True,
-                "message": "Analisis berhasil dan data telah disimpan.",
+                "message": "Laporan diterima, analisis sedang diproses.",
                 "filename": file.filename,
-                "result": result
+                "complaint_id": complaint_id,
+                "complaint_number": created['complaint_number'],
+                "status": "queued",
+                "pdf_url": pdf_url,
+                "status_url": f"/analyze/{complaint_id}"
             }
         )
 
@@ -155,10 +395,84 @@ async def analyze_laporan(file: UploadFile = File(...)):
             detail=f"Terjadi kesalahan internal pada server: {e}"
         )
     finally:
+        if upload_task:
+            # Jangan hapus file selagi upload ke Storage masih membacanya;
+            # batas waktunya sama dengan _wait_for_upload, bukan tambahan
+            if not upload_task.done():
+                await asyncio.wait({upload_task}, timeout=_upload_time_left(upload_deadline))
+            
+            # Upload yang ditolak/gagal dihapus dari bucket, upload yang
+            # terlambat disimpan pdf_url-nya setelah selesai
+            if accepted_id is None or pdf_url is None:
+                _follow_up_upload(processor, upload_task, storage_path, accepted_id)
+
         # Selalu hapus file sementara setelah selesai
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-                logger.info(f"File sementara dihapus: {temp_path}")
-            except Exception as e:
-                logger.error(f"Gagal menghapus file sementara {temp_path}: {e}")
\ No newline at end of file
+        _remove_temp_file(temp_path)
+
+@app.post("/analyze/stream")
+async def analyze_laporan_stream(
+    file: UploadFile = File(...),
+    processor: LegalComplaintProcessor = Depends(get_processor)
+):
+    """
+    Upload dan analisis laporan dengan hasil yang di-stream sebagai NDJSON.
+    
+    Setiap baris adalah satu event JSON yang dikirim begitu langkahnya
+    selesai: complaint_created, summary, legal_articles, recommendations,
+    lalu completed (atau error).
+    """
+    temp_path = _temp_path(file.filename)
+    logger.info(f"Menerima file (stream): {file.filename}. Menyimpan ke: {temp_path}")
+
+    try:
+        await _save_upload(file, temp_path)
+    except Exception:
+        _remove_temp_file(temp_path)
+        raise
+
+    async def events():
+        async for event in processor.stream_complaint(
+            temp_path, app_state["batcher"], uploaded_by='system-api',
+            pdf_filename=file.filename
+        ):
+            yield orjson.dumps(event, default=str, option=orjson.OPT_APPEND_NEWLINE)
+
+    return _TempFileStreamingResponse(events(), temp_path, media_type="application/x-ndjson")
+
+@app.get("/analyze/{complaint_id}")
+async def get_analysis_status(
+    complaint_id: str,
+    processor: LegalComplaintProcessor = Depends(get_processor)
+):
+    """
+    Endpoint untuk memantau status analisis dan mengambil hasilnya.
+    """
+    data = await run_in_threadpool(processor.db.get_complaint_with_analysis, complaint_id)
+    
+    if not data:
+        raise HTTPException(status_code=404, detail=f"Complaint tidak ditemukan: {complaint_id}")
+
+    status = data['complaint'].get('status')
+    return ORJSONResponse(
+        status_code=200,
+        content={
+            "success": status in ANALYZED_STATUSES,
+            "complaint_id": complaint_id,
+            "status": status,
+            "result": data if status in ANALYZED_STATUSES else None
+        }
+    )
+
+
+# --- Menjalankan server lokal: python api_server.py ---
+# uvicorn otomatis memakai uvloop + httptools bila keduanya terpasang
+if __name__ == "__main__":
+    import uvicorn
+    
+    uvicorn.run(
+        "api_server:app",
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "8000")),
+        loop="auto",
+        http="auto"
+    )
@@ -0,0 +1,91 @@
+"""
+Check that the compiled helpers (utils/_helpers.pyx) match the Python versions
+
+Build the extension first: cythonize -i utils/_helpers.pyx
+"""
+import sys
+import random
+import importlib
+from decimal import Decimal
+
+try:
+    compiled = importlib.import_module('utils._helpers')
+except ImportError:
+    print("❌ utils._helpers is not built (run: cythonize -i utils/_helpers.pyx)")
+    sys.exit(1)
+
+# Import helpers with the extension hidden so its pure-Python versions stay bound
+sys.modules['utils._helpers'] = None
+python = importlib.import_module('utils.helpers')
+
+rng = random.Random(1)
+
+
+def filename_samples():
+    chars = [chr(i) for i in range(400)] + ['é', '文', ' ', '　', '٣', '_']
+    yield from ('', 'Laporan Budi (final).pdf', 'a b\tc.pdf', '../../etc/passwd')
+    for _ in range(50000):
+        yield ''.join(rng.choice(chars) for _ in range(rng.randint(0, 15)))
+
+
+def amount_samples():
+    yield from (0, -0, 0.0, -0.0, 0.5, 1.5, 2.5, -0.4, -0.5, 1e300, -1e300, 2.0 ** 53 + 1,
+                float('inf'), float('-inf'), float('nan'), True,
+                10 ** 20 + 1, -(10 ** 20 + 1), 10 ** 400, -(10 ** 400),
+                Decimal('1234.5'), Decimal('-0.5'), Decimal('12345678901234567890.6'))
+    for _ in range(200000):
+        yield rng.choice([
+            rng.uniform(-1e15, 1e15),
+            rng.uniform(-1, 1),
+            rng.randint(-5000, 5000) + rng.choice([0.0, 0.5, -0.5, 0.49]),
+            rng.randint(-10 ** 25, 10 ** 25),
+        ])
+
+
+def date_samples():
+    yield from ('', 'x', '2024-03-12', '12-03-2024', '12/03/2024', '31/02/2024',
+                '12 March 2024', '12 Mar 2024', '12 maret 2024', '1/3/2024', '2024-3-1',
+                '2024-13-01', '0000-01-01', '0999-01-01', '١٢/٠٣/٢٠٢٤', '12-03/2024',
+                '2024/03/12', ' 2024-03-12', '2024-03-12\n')
+    for day in range(33):
+        for month in range(14):
+            for year in ('2024', '1999', '1000'):
+                yield from (f'{year}-{month:02d}-{day:02d}', f'{day:02d}-{month:02d}-{year}',
+                            f'{day:02d}/{month:02d}/{year}', f'{day}/{month}/{year}',
+                            f'{day}-{month}-{year}', f'{day} Jan {year}')
+
+
+def outcome(func, value):
+    """Return value or raised exception type, so errors are compared too"""
+    try:
+        return func(value)
+    except Exception as e:
+        return type(e)
+
+
+checks = [
+    ('sanitize_filename', filename_samples()),
+    ('format_currency', amount_samples()),
+    ('parse_date', date_samples()),
+]
+
+failed = False
+for name, samples in checks:
+    compiled_func, python_func = getattr(compiled, name), getattr(python, name)
+    total = 0
+    mismatches = []
+    for value in samples:
+        total += 1
+        expected, actual = outcome(python_func, value), outcome(compiled_func, value)
+        if expected != actual:
+            mismatches.append((value, expected, actual))
+
+    if mismatches:
+        failed = True
+        print(f"❌ {name}: {len(mismatches)}/{total} mismatches")
+        for value, expected, actual in mismatches[:5]:
+            print(f"    {value!r}: python={expected!r} compiled={actual!r}")
+    else:
+        print(f"✅ {name}: {total} inputs match")
+
+sys.exit(1 if failed else 0)
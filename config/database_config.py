@@ -2,11 +2,13 @@
 Database Configuration Module
 """
 import os
+from typing import Optional
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (skipped when the platform already provides them)
+if not os.getenv('SUPABASE_URL'):
+    load_dotenv()
 
 class SupabaseConfig:
     """Supabase configuration and client initialization"""
@@ -20,7 +22,14 @@ class SupabaseConfig:
             raise ValueError("Missing Supabase credentials in environment variables")
         
         self.client: Client = create_client(self.url, self.key)
-        self.admin_client: Client = create_client(self.url, self.service_key) if self.service_key else None
+        self._admin_client: Optional[Client] = None
+    
+    @property
+    def admin_client(self) -> Optional[Client]:
+        """Service-role client, created on first use"""
+        if self._admin_client is None and self.service_key:
+            self._admin_client = create_client(self.url, self.service_key)
+        return self._admin_client
     
     def get_client(self, use_admin=False) -> Client:
         """Get Supabase client"""
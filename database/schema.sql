@@ -14,15 +14,17 @@ CREATE TABLE complaints (
     pdf_path TEXT,
     pdf_url TEXT,
     extracted_text TEXT,
-    status VARCHAR(50) DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'analyzed', 'validated', 'error')),
+    extracted_text_compressed BYTEA,
+    text_encoding VARCHAR(20) DEFAULT 'plain' CHECK (text_encoding IN ('plain', 'zstd')),
+    status VARCHAR(50) DEFAULT 'pending' CHECK (status IN ('pending', 'queued', 'processing', 'analyzed', 'validated', 'error', 'rejected_lowquality')),
     uploaded_by VARCHAR(100),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
-CREATE INDEX idx_complaints_status ON complaints(status);
+-- complaint_number is already indexed by its UNIQUE constraint
+CREATE INDEX idx_complaints_status_upload_date ON complaints(status, upload_date DESC);
 CREATE INDEX idx_complaints_upload_date ON complaints(upload_date DESC);
-CREATE INDEX idx_complaints_number ON complaints(complaint_number);
 
 -- Table: analysis_results
 CREATE TABLE analysis_results (
@@ -85,7 +87,7 @@ CREATE TABLE legal_articles (
     FOREIGN KEY (analysis_id) REFERENCES analysis_results(id)
 );
 
-CREATE INDEX idx_articles_analysis_id ON legal_articles(analysis_id);
+CREATE INDEX idx_articles_analysis_confidence ON legal_articles(analysis_id, confidence_score DESC);
 CREATE INDEX idx_articles_pasal ON legal_articles(pasal_number);
 CREATE INDEX idx_articles_confidence ON legal_articles(confidence_score DESC);
 CREATE INDEX idx_articles_primary ON legal_articles(is_primary) WHERE is_primary = TRUE;
@@ -124,11 +126,22 @@ CREATE TABLE analysis_logs (
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
-CREATE INDEX idx_logs_complaint ON analysis_logs(complaint_id);
+CREATE INDEX idx_logs_complaint_timestamp ON analysis_logs(complaint_id, timestamp DESC);
 CREATE INDEX idx_logs_analysis ON analysis_logs(analysis_id);
 CREATE INDEX idx_logs_timestamp ON analysis_logs(timestamp DESC);
 CREATE INDEX idx_logs_action ON analysis_logs(action);
 
+-- Table: analysis_cache
+-- AI analysis keyed by SHA-256 of the extracted text, so re-uploads skip Gemini
+CREATE TABLE analysis_cache (
+    text_hash CHAR(64) NOT NULL,
+    model_version VARCHAR(100) NOT NULL,
+    full_analysis_json JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() + INTERVAL '30 days',
+    PRIMARY KEY (text_hash, model_version)
+);
+
 -- Table: users (optional)
 CREATE TABLE users (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -165,3 +178,120 @@ CREATE TRIGGER update_users_updated_at
     BEFORE UPDATE ON users
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
+
+
+-- Save an analysis with its legal articles, recommendations and audit logs
+-- in a single transaction (one RPC round-trip instead of one per table).
+-- payload: {analysis: {...}, articles: [...], recommendations: [...],
+--           logs: [...], status: 'analyzed'}
+CREATE OR REPLACE FUNCTION save_full_analysis(payload JSONB)
+RETURNS UUID AS $$
+DECLARE
+    v_analysis_id UUID;
+    v_complaint_id UUID;
+BEGIN
+    INSERT INTO analysis_results (
+        id, complaint_id, pelapor_nama, pelapor_ktp, pelapor_kontak,
+        terlapor_nama, terlapor_identitas, terlapor_ciri,
+        kejadian_tanggal, kejadian_waktu, kejadian_lokasi, kejadian_provinsi,
+        kronologi, jenis_kasus, kerugian_materil, kerugian_immateril,
+        bukti_fisik, bukti_dokumen, bukti_saksi, bukti_digital,
+        executive_summary, key_points, tingkat_urgensi, alasan_urgensi,
+        missing_information, kelengkapan_laporan, kualitas_bukti,
+        kompleksitas_kasus, full_analysis_json, analyzed_by,
+        analysis_duration_seconds
+    )
+    SELECT
+        COALESCE(r.id, uuid_generate_v4()), r.complaint_id, r.pelapor_nama, r.pelapor_ktp, r.pelapor_kontak,
+        r.terlapor_nama, r.terlapor_identitas, r.terlapor_ciri,
+        r.kejadian_tanggal, r.kejadian_waktu, r.kejadian_lokasi, r.kejadian_provinsi,
+        r.kronologi, r.jenis_kasus, r.kerugian_materil, r.kerugian_immateril,
+        r.bukti_fisik, r.bukti_dokumen, r.bukti_saksi, r.bukti_digital,
+        r.executive_summary, r.key_points, r.tingkat_urgensi, r.alasan_urgensi,
+        r.missing_information, r.kelengkapan_laporan, r.kualitas_bukti,
+        r.kompleksitas_kasus, r.full_analysis_json, r.analyzed_by,
+        r.analysis_duration_seconds
+    FROM jsonb_populate_record(NULL::analysis_results, payload->'analysis') AS r
+    RETURNING id, complaint_id INTO v_analysis_id, v_complaint_id;
+
+    INSERT INTO legal_articles (
+        analysis_id, pasal_number, sumber_hukum, judul_pasal, bunyi_pasal,
+        elemen_konstitutif, elemen_terpenuhi, confidence_score, confidence_level,
+        reasoning, is_primary, article_type
+    )
+    SELECT
+        v_analysis_id, r.pasal_number, r.sumber_hukum, r.judul_pasal, r.bunyi_pasal,
+        r.elemen_konstitutif, r.elemen_terpenuhi, r.confidence_score, r.confidence_level,
+        r.reasoning, COALESCE(r.is_primary, FALSE), r.article_type
+    FROM jsonb_populate_recordset(NULL::legal_articles, COALESCE(payload->'articles', '[]'::jsonb)) AS r;
+
+    INSERT INTO recommendations (
+        analysis_id, recommendation_text, priority, category, status, assigned_to, notes
+    )
+    SELECT
+        v_analysis_id, r.recommendation_text, r.priority, r.category,
+        COALESCE(r.status, 'pending'), r.assigned_to, r.notes
+    FROM jsonb_populate_recordset(NULL::recommendations, COALESCE(payload->'recommendations', '[]'::jsonb)) AS r;
+
+    INSERT INTO analysis_logs (complaint_id, analysis_id, action, action_by, details, metadata)
+    SELECT v_complaint_id, v_analysis_id, r.action, r.action_by, r.details, r.metadata
+    FROM jsonb_populate_recordset(NULL::analysis_logs, COALESCE(payload->'logs', '[]'::jsonb)) AS r;
+
+    IF payload->>'status' IS NOT NULL THEN
+        UPDATE complaints SET status = payload->>'status' WHERE id = v_complaint_id;
+    END IF;
+
+    RETURN v_analysis_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Dashboard counters in a single round-trip (used by DatabaseManager.get_statistics)
+CREATE OR REPLACE FUNCTION get_dashboard_stats()
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'total_complaints', (SELECT COUNT(*) FROM complaints),
+        'pending', (SELECT COUNT(*) FROM complaints WHERE status = 'pending'),
+        'analyzed', (SELECT COUNT(*) FROM complaints WHERE status = 'analyzed'),
+        'high_urgency', (SELECT COUNT(*) FROM analysis_results WHERE tingkat_urgensi = 'Tinggi')
+    );
+$$ LANGUAGE sql STABLE;
+
+-- ═══════════════════════════════════════════════════════════════
+-- Upgrades for databases created from an older version of this file
+-- ═══════════════════════════════════════════════════════════════
+
+-- Compressed extracted_text (the API writes these columns on every upload)
+-- ALTER TABLE complaints
+--     ADD COLUMN IF NOT EXISTS extracted_text_compressed BYTEA,
+--     ADD COLUMN IF NOT EXISTS text_encoding VARCHAR(20) DEFAULT 'plain' CHECK (text_encoding IN ('plain', 'zstd'));
+
+-- Complaint statuses 'queued' (background analysis) and 'rejected_lowquality'
+-- ALTER TABLE complaints
+--     DROP CONSTRAINT IF EXISTS complaints_status_check,
+--     ADD CONSTRAINT complaints_status_check CHECK (status IN ('pending', 'queued', 'processing', 'analyzed', 'validated', 'error', 'rejected_lowquality'));
+
+-- save_full_analysis: LegalComplaintProcessor.save_analysis saves every analysis through
+-- this RPC, so run the CREATE OR REPLACE FUNCTION save_full_analysis statement
+-- above (it is safe to re-run) on older databases
+
+-- get_dashboard_stats: /stats reads its counters from this function, so also
+-- run the CREATE OR REPLACE FUNCTION get_dashboard_stats statement above
+
+-- AI analysis cache (the primary key serves the text_hash/model_version lookup)
+-- CREATE TABLE IF NOT EXISTS analysis_cache (
+--     text_hash CHAR(64) NOT NULL,
+--     model_version VARCHAR(100) NOT NULL,
+--     full_analysis_json JSONB NOT NULL,
+--     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+--     expires_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() + INTERVAL '30 days',
+--     PRIMARY KEY (text_hash, model_version)
+-- );
+
+-- Index changes (run one statement at a time; CONCURRENTLY cannot run in a transaction)
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_complaints_number;
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_complaints_status_upload_date ON complaints(status, upload_date DESC);
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_complaints_status;
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_articles_analysis_confidence ON legal_articles(analysis_id, confidence_score DESC);
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_articles_analysis_id;
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_complaint_timestamp ON analysis_logs(complaint_id, timestamp DESC);
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_logs_complaint;
@@ -1,11 +1,16 @@
 import os
 import sys
-from datetime import datetime
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, time
 from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (skipped when the platform already provides them)
+if not os.getenv("SUPABASE_URL"):
+    load_dotenv()
 
 # Add src to path
 # Cek jika 'src' sudah ada di path (untuk menghindari duplikasi jika diimpor)
@@ -15,32 +20,79 @@ if current_path not in sys.path:
 
 try:
     from src.database import DatabaseManager
-    from src.pdf_extractor import PDFExtractor
-    from src.ai_analyzer import LegalAIAnalyzer
-    from src.models import Complaint, AnalysisResult, LegalArticle, Recommendation
+    from src.pdf_extractor import PDFExtractor, EXTRACTION_CACHE_SIZE
+    from src.ai_analyzer import LegalAIAnalyzer, AsyncBatcher
+    from src.models import Complaint, AnalysisResult, GeminiAnalysis, LegalArticle, Recommendation
     from utils.helpers import (
         generate_complaint_number,
-        sanitize_filename,
-        print_separator,
-        print_section_header
+        parse_date,
+        sanitize_filename
     )
 except ImportError as e:
     print(f"Error: Gagal mengimpor modul. Pastikan semua file ada di 'src/' dan 'utils/'. Error: {e}")
     sys.exit(1)
 
+logger = logging.getLogger(__name__)
+
+# Gate for uploads that are not complaint reports (or unreadable scans),
+# checked before any Gemini call is made
+MIN_COMPLAINT_TEXT_LENGTH = 500
+COMPLAINT_KEYWORDS = ("pelapor", "terlapor", "kronologi", "laporan")
+MIN_KEYWORD_SCORE = 2
+
+
+def _parse_time(time_string: Optional[str]) -> Optional[time]:
+    """Incident time from the AI output as a time, or None if it is not HH:MM[:SS]"""
+    if not time_string:
+        return None
+    try:
+        return time.fromisoformat(time_string.strip().replace('.', ':'))
+    except ValueError:
+        return None
+
 
 class LegalComplaintProcessor:
     """Main processor for legal complaints"""
     
-    def __init__(self):
-        """Initialize all components"""
-        print("🚀 Initializing Legal Complaint Analyzer...")
+    def __init__(self, cache: bool = True):
+        """
+        Initialize all components
         
+        Args:
+            cache: Reuse extractions and AI analyses of identical documents
+        """
+        logger.debug("🚀 Initializing Legal Complaint Analyzer...")
+        
+        self.cache = cache
         self.db = DatabaseManager()
-        self.pdf_extractor = PDFExtractor()
+        self.pdf_extractor = PDFExtractor(cache_size=EXTRACTION_CACHE_SIZE if cache else 0)
         self.ai_analyzer = LegalAIAnalyzer()
         
-        print("✓ All components initialized\n")
+        logger.debug("✓ All components initialized")
+    
+    def warmup(self) -> dict:
+        """
+        Touch every heavy dependency once so the first request is not slowed
+        by lazy imports or connection setup. Failures are reported, not raised.
+        
+        Returns:
+            Dictionary of component name -> True if warm, or the error message
+        """
+        checks = {
+            'pdf_extractor': self.pdf_extractor.warmup,
+            'database': self.db.ping,
+            'ai_analyzer': self.ai_analyzer.ping,
+        }
+        
+        results = {}
+        for name, check in checks.items():
+            try:
+                results[name] = check()
+            except Exception as e:
+                logger.warning(f"⚠ Warmup failed for {name}: {e}")
+                results[name] = str(e)
+        
+        return results
     
     def process_complaint(self, pdf_path: str, uploaded_by: str = 'system') -> dict:
         """
@@ -53,46 +105,122 @@ class LegalComplaintProcessor:
         Returns:
             Dictionary with processing results
         """
-        print_section_header("LEGAL COMPLAINT ANALYZER - PROCESSING PIPELINE")
+        logger.debug("LEGAL COMPLAINT ANALYZER - PROCESSING PIPELINE")
+        
+        start_time = datetime.now()
+        
+        created = self.create_complaint(pdf_path, uploaded_by=uploaded_by)
+        if not created.get('success'):
+            return created
+        
+        return self.analyze_complaint(
+            created['complaint_id'],
+            created['extracted_text'],
+            complaint_number=created['complaint_number'],
+            start_time=start_time
+        )
+    
+    def create_complaint(self, pdf_path: str, uploaded_by: str = 'system',
+                         status: str = 'processing',
+                         pdf_filename: Optional[str] = None) -> dict:
+        """
+        Extract text from the PDF and save the complaint record (steps 1-2)
         
+        Args:
+            pdf_path: Path to PDF file
+            uploaded_by: Username of uploader
+            status: Initial complaint status ('processing' or 'queued')
+            pdf_filename: Original filename to record (defaults to the
+                basename of pdf_path, e.g. when pdf_path is a temp file)
+            
+        Returns:
+            Dictionary with complaint_id, complaint_number and extracted_text.
+            Texts that fail the quality gate are saved with status
+            'rejected_lowquality' and return error 'unparseable'.
+        """
         # Validate file exists
         if not os.path.exists(pdf_path):
-            print(f"✗ File not found: {pdf_path}")
+            logger.error(f"✗ File not found: {pdf_path}")
             return {'success': False, 'error': 'File not found'}
         
-        start_time = datetime.now()
-        complaint_id = None # Inisialisasi jika gagal di langkah awal
-        analysis_id = None
-        
         try:
             # ═══════════════════════════════════════════════════════
             # STEP 1: Extract Text from PDF
             # ═══════════════════════════════════════════════════════
-            print_section_header("STEP 1: PDF TEXT EXTRACTION")
+            logger.debug("STEP 1: PDF TEXT EXTRACTION")
             
             extracted_text = self.pdf_extractor.extract_text(pdf_path)
+        except Exception as e:
+            return self._handle_processing_error(e, None, None)
+        
+        return self._save_complaint(pdf_path, extracted_text, uploaded_by, status, pdf_filename)
+    
+    async def create_complaint_async(self, pdf_path: str, uploaded_by: str = 'system',
+                                     status: str = 'processing',
+                                     pdf_filename: Optional[str] = None) -> dict:
+        """
+        create_complaint without blocking the event loop
+        
+        Extraction runs via PDFExtractor.extract_text_async, so several
+        uploads are extracted concurrently; the Supabase calls that follow
+        run in a worker thread.
+        
+        Args:
+            pdf_path: Path to PDF file
+            uploaded_by: Username of uploader
+            status: Initial complaint status ('processing' or 'queued')
+            pdf_filename: Original filename to record (defaults to basename of pdf_path)
             
+        Returns:
+            Same dictionary as create_complaint
+        """
+        if not os.path.exists(pdf_path):
+            logger.error(f"✗ File not found: {pdf_path}")
+            return {'success': False, 'error': 'File not found'}
+        
+        try:
+            logger.debug("STEP 1: PDF TEXT EXTRACTION")
+            extracted_text = await self.pdf_extractor.extract_text_async(pdf_path)
+        except Exception as e:
+            return self._handle_processing_error(e, None, None)
+        
+        return await asyncio.to_thread(
+            self._save_complaint, pdf_path, extracted_text, uploaded_by, status, pdf_filename
+        )
+    
+    def _save_complaint(self, pdf_path: str, extracted_text: Optional[str],
+                        uploaded_by: str, status: str,
+                        pdf_filename: Optional[str]) -> dict:
+        """Quality-gate the extracted text and save the complaint record (step 2)"""
+        complaint_id = None # Inisialisasi jika gagal di langkah awal
+        
+        try:
             if not extracted_text:
-                print("✗ Failed to extract text from PDF")
+                logger.error("✗ Failed to extract text from PDF")
                 return {'success': False, 'error': 'Text extraction failed'}
             
-            print(f"✓ Extracted {len(extracted_text)} characters")
-            print(f"✓ Preview: {extracted_text[:200]}...\n")
+            logger.debug(f"✓ Extracted {len(extracted_text)} characters")
+            logger.debug(f"✓ Preview: {extracted_text[:200]}...")
+            
+            parseable = self._is_parseable_complaint(extracted_text)
+            if not parseable:
+                logger.warning("⚠ Text does not look like a complaint report, skipping AI analysis")
+                status = 'rejected_lowquality'
             
             # ═══════════════════════════════════════════════════════
             # STEP 2: Create Complaint Record
             # ═══════════════════════════════════════════════════════
-            print_section_header("STEP 2: SAVING COMPLAINT TO DATABASE")
+            logger.debug("STEP 2: SAVING COMPLAINT TO DATABASE")
             
             complaint_number = generate_complaint_number()
-            pdf_filename = sanitize_filename(os.path.basename(pdf_path))
+            pdf_filename = sanitize_filename(pdf_filename or os.path.basename(pdf_path))
             
             complaint = Complaint(
                 complaint_number=complaint_number,
                 pdf_filename=pdf_filename,
                 pdf_path=pdf_path, # Path di server sementara
                 extracted_text=extracted_text,
-                status='processing',
+                status=status,
                 uploaded_by=uploaded_by
             )
             
@@ -108,125 +236,365 @@ class LegalComplaintProcessor:
                 details=f'PDF: {pdf_filename}'
             )
             
-            print(f"✓ Complaint saved with ID: {complaint_id}")
-            print(f"✓ Complaint number: {complaint_number}\n")
+            logger.debug(f"✓ Complaint saved with ID: {complaint_id}")
+            logger.debug(f"✓ Complaint number: {complaint_number}")
+            
+            if not parseable:
+                return {
+                    'success': False,
+                    'error': 'unparseable',
+                    'complaint_id': str(complaint_id),
+                    'complaint_number': complaint_number
+                }
+            
+            return {
+                'success': True,
+                'complaint_id': str(complaint_id),
+                'complaint_number': complaint_number,
+                'extracted_text': extracted_text
+            }
+            
+        except Exception as e:
+            return self._handle_processing_error(e, complaint_id, None)
+    
+    def _is_parseable_complaint(self, extracted_text: str) -> bool:
+        """
+        Cheap check that the text is a complaint report worth sending to Gemini
+        
+        Args:
+            extracted_text: Text extracted from the complaint PDF
+            
+        Returns:
+            False for short texts or texts mentioning too few complaint keywords
+        """
+        if len(extracted_text) < MIN_COMPLAINT_TEXT_LENGTH:
+            return False
+        
+        lowered = extracted_text.lower()
+        score = sum(lowered.count(keyword) for keyword in COMPLAINT_KEYWORDS)
+        return score >= MIN_KEYWORD_SCORE
+    
+    def analyze_complaint(self, complaint_id: str, extracted_text: str,
+                          complaint_number: Optional[str] = None,
+                          start_time: Optional[datetime] = None) -> dict:
+        """
+        Run AI analysis for an existing complaint and save the results (steps 3-7)
+        
+        Args:
+            complaint_id: ID of a complaint created by create_complaint
+            extracted_text: Text extracted from the complaint PDF
+            complaint_number: Complaint number (for the summary output)
+            start_time: Pipeline start time (defaults to now)
+            
+        Returns:
+            Dictionary with processing results
+        """
+        start_time = start_time or datetime.now()
+        
+        try:
+            self.db.update_complaint_status(complaint_id, 'processing')
             
             # ═══════════════════════════════════════════════════════
             # STEP 3: AI Analysis
             # ═══════════════════════════════════════════════════════
-            print_section_header("STEP 3: AI ANALYSIS")
+            logger.debug("STEP 3: AI ANALYSIS")
             
-            analysis_result = self.ai_analyzer.analyze(extracted_text)
+            text_hash, analysis_result = self._get_cached_analysis(extracted_text)
             
             if not analysis_result:
-                print("✗ AI analysis failed")
+                analysis_result = self.ai_analyzer.analyze(extracted_text)
+                self._cache_analysis(text_hash, analysis_result)
+            
+        except Exception as e:
+            return self._handle_processing_error(e, complaint_id, None)
+        
+        return self.save_analysis(complaint_id, analysis_result, complaint_number, start_time)
+    
+    async def analyze_complaint_async(self, complaint_id: str, extracted_text: str,
+                                      batcher: AsyncBatcher,
+                                      complaint_number: Optional[str] = None,
+                                      start_time: Optional[datetime] = None) -> dict:
+        """
+        Async variant of analyze_complaint that shares Gemini calls via a batcher
+        
+        Args:
+            complaint_id: ID of a complaint created by create_complaint
+            extracted_text: Text extracted from the complaint PDF
+            batcher: AsyncBatcher that coalesces concurrent analyses
+            complaint_number: Complaint number (for the summary output)
+            start_time: Pipeline start time (defaults to now)
+            
+        Returns:
+            Dictionary with processing results
+        """
+        start_time = start_time or datetime.now()
+        
+        try:
+            await asyncio.to_thread(self.db.update_complaint_status, complaint_id, 'processing')
+            
+            logger.debug("STEP 3: AI ANALYSIS (BATCHED)")
+            
+            analysis_result = await self._analyze_text_async(extracted_text, batcher)
+            
+        except asyncio.CancelledError as e:
+            # Shutdown (AsyncBatcher.stop) cancels in-flight analyses; mark the
+            # complaint failed so pollers do not wait on 'processing' forever
+            await asyncio.shield(
+                asyncio.to_thread(self._handle_processing_error, e, complaint_id, None)
+            )
+            raise
+        except Exception as e:
+            return await asyncio.to_thread(self._handle_processing_error, e, complaint_id, None)
+        
+        return await asyncio.to_thread(
+            self.save_analysis, complaint_id, analysis_result, complaint_number, start_time
+        )
+    
+    async def stream_complaint(self, pdf_path: str, batcher: AsyncBatcher,
+                               uploaded_by: str = 'system',
+                               pdf_filename: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Run the full pipeline, yielding an event dict as each step finishes
+        
+        Args:
+            pdf_path: Path to PDF file
+            batcher: AsyncBatcher that coalesces concurrent analyses
+            uploaded_by: Username of uploader
+            pdf_filename: Original filename to record (defaults to basename of pdf_path)
+            
+        Yields:
+            Event dictionaries: complaint_created, summary, legal_articles,
+            recommendations, then completed (or error)
+        """
+        start_time = datetime.now()
+        
+        created = await self.create_complaint_async(
+            pdf_path, uploaded_by, pdf_filename=pdf_filename
+        )
+        if not created.get('success'):
+            yield {'event': 'error', **created}
+            return
+        
+        complaint_id = created['complaint_id']
+        complaint_number = created['complaint_number']
+        yield {
+            'event': 'complaint_created',
+            'complaint_id': complaint_id,
+            'complaint_number': complaint_number,
+            'text_length': len(created['extracted_text'])
+        }
+        
+        try:
+            logger.debug("STEP 3: AI ANALYSIS (STREAMING)")
+            analysis_result = await self._analyze_text_async(created['extracted_text'], batcher)
+        except asyncio.CancelledError as e:
+            # Client disconnected or the batcher stopped at shutdown: mark the
+            # complaint failed so it is not left in 'processing'
+            await asyncio.shield(
+                asyncio.to_thread(self._handle_processing_error, e, complaint_id, None)
+            )
+            raise
+        except Exception as e:
+            error = await asyncio.to_thread(self._handle_processing_error, e, complaint_id, None)
+            yield {'event': 'error', **error}
+            return
+        
+        if analysis_result:
+            yield {
+                'event': 'summary',
+                'jenis_kasus': analysis_result.jenis_kasus,
+                'summary': analysis_result.summary.model_dump(mode='json'),
+                'quality': analysis_result.quality.model_dump(mode='json')
+            }
+            yield {
+                'event': 'legal_articles',
+                'items': [
+                    article.model_dump(mode='json')
+                    for article in analysis_result.pasal_utama + analysis_result.pasal_alternatif
+                ]
+            }
+            yield {
+                'event': 'recommendations',
+                'items': [rec.model_dump(mode='json') for rec in analysis_result.recommendations]
+            }
+        
+        result = await asyncio.to_thread(
+            self.save_analysis, complaint_id, analysis_result, complaint_number, start_time
+        )
+        yield {'event': 'completed' if result.get('success') else 'error', **result}
+    
+    async def _analyze_text_async(self, extracted_text: str,
+                                  batcher: AsyncBatcher) -> Optional[GeminiAnalysis]:
+        """Cached analysis lookup, falling back to the shared batcher on a miss"""
+        text_hash, analysis_result = await asyncio.to_thread(self._get_cached_analysis, extracted_text)
+        
+        if not analysis_result:
+            analysis_result = await batcher.submit(extracted_text)
+            await asyncio.to_thread(self._cache_analysis, text_hash, analysis_result)
+        
+        return analysis_result
+    
+    def _get_cached_analysis(self, extracted_text: str) -> Tuple[str, Optional[GeminiAnalysis]]:
+        """
+        Look up a previous analysis of the same text
+        
+        Returns:
+            (text_hash, cached analysis or None)
+        """
+        text_hash = hashlib.sha256(extracted_text.encode('utf-8')).hexdigest()
+        if not self.cache:
+            return text_hash, None
+        
+        cached = self.db.get_cached_analysis(text_hash, self.ai_analyzer.model_name)
+        if not cached:
+            return text_hash, None
+        
+        logger.debug(f"✓ Reusing cached analysis for text hash {text_hash[:12]}...")
+        analysis_result = GeminiAnalysis.model_validate(cached)
+        analysis_result.metadata = {**analysis_result.metadata, 'cache_hit': True}
+        return text_hash, analysis_result
+    
+    def _cache_analysis(self, text_hash: str, analysis_result: Optional[GeminiAnalysis]) -> None:
+        """Store a fresh analysis so identical re-uploads skip Gemini"""
+        if self.cache and analysis_result:
+            self.db.save_cached_analysis(
+                text_hash, self.ai_analyzer.model_name, analysis_result.to_json_dict()
+            )
+    
+    def save_analysis(self, complaint_id: str, analysis_result: Optional[GeminiAnalysis],
+                      complaint_number: Optional[str] = None,
+                      start_time: Optional[datetime] = None) -> dict:
+        """
+        Save AI analysis results for a complaint (steps 4-7)
+        
+        Args:
+            complaint_id: ID of the analyzed complaint
+            analysis_result: Parsed analysis from LegalAIAnalyzer (None if it failed)
+            complaint_number: Complaint number (for the summary output)
+            start_time: Pipeline start time (defaults to now)
+            
+        Returns:
+            Dictionary with processing results
+        """
+        start_time = start_time or datetime.now()
+        analysis_id = None
+        
+        try:
+            if not analysis_result:
+                logger.error("✗ AI analysis failed")
                 self.db.update_complaint_status(complaint_id, 'error')
                 return {'success': False, 'error': 'AI analysis failed'}
             
-            print("✓ AI analysis completed successfully\n")
+            logger.debug("✓ AI analysis completed successfully")
             
             # ═══════════════════════════════════════════════════════
             # STEP 4: Save Analysis Results
             # ═══════════════════════════════════════════════════════
-            print_section_header("STEP 4: SAVING ANALYSIS RESULTS")
+            logger.debug("STEP 4: SAVING ANALYSIS RESULTS")
             
-            # Prepare analysis model
+            # Prepare analysis model. Gemini returns dates and times as free
+            # text; values that do not parse are stored as NULL instead of
+            # failing the whole analysis.
+            a = analysis_result
+            tanggal = a.kejadian.tanggal.strip() if a.kejadian.tanggal else None
             analysis_model = AnalysisResult(
                 complaint_id=complaint_id,
-                pelapor_nama=analysis_result.get('pelapor', {}).get('nama'),
-                pelapor_ktp=analysis_result.get('pelapor', {}).get('ktp'),
-                pelapor_kontak=analysis_result.get('pelapor', {}).get('kontak'),
-                terlapor_nama=analysis_result.get('terlapor', {}).get('nama'),
-                terlapor_identitas=analysis_result.get('terlapor', {}).get('identitas'),
-                terlapor_ciri=analysis_result.get('terlapor', {}).get('ciri'),
-                kejadian_tanggal=analysis_result.get('kejadian', {}).get('tanggal'),
-                kejadian_waktu=analysis_result.get('kejadian', {}).get('waktu'),
-                kejadian_lokasi=analysis_result.get('kejadian', {}).get('lokasi'),
-                kejadian_provinsi=analysis_result.get('kejadian', {}).get('provinsi'),
-                kronologi=analysis_result.get('kronologi'),
-                jenis_kasus=analysis_result.get('jenis_kasus'),
-                kerugian_materil=analysis_result.get('kerugian', {}).get('materil'),
-                kerugian_immateril=analysis_result.get('kerugian', {}).get('immateril'),
-                bukti_fisik=analysis_result.get('bukti', {}).get('fisik'),
-                bukti_dokumen=analysis_result.get('bukti', {}).get('dokumen'),
-                bukti_saksi=analysis_result.get('bukti', {}).get('saksi'),
-                bukti_digital=analysis_result.get('bukti', {}).get('digital'),
-                executive_summary=analysis_result.get('summary', {}).get('executive_summary'),
-                key_points=analysis_result.get('summary', {}).get('key_points'),
-                tingkat_urgensi=analysis_result.get('summary', {}).get('tingkat_urgensi'),
-                alasan_urgensi=analysis_result.get('summary', {}).get('alasan_urgensi'),
-                missing_information=analysis_result.get('summary', {}).get('missing_information'),
-                kelengkapan_laporan=analysis_result.get('quality', {}).get('kelengkapan_laporan'),
-                kualitas_bukti=analysis_result.get('quality', {}).get('kualitas_bukti'),
-                kompleksitas_kasus=analysis_result.get('quality', {}).get('kompleksitas_kasus'),
-                full_analysis_json=analysis_result,
+                pelapor_nama=a.pelapor.nama,
+                pelapor_ktp=a.pelapor.ktp,
+                pelapor_kontak=a.pelapor.kontak,
+                terlapor_nama=a.terlapor.nama,
+                terlapor_identitas=a.terlapor.identitas,
+                terlapor_ciri=a.terlapor.ciri,
+                kejadian_tanggal=parse_date(tanggal) if tanggal else None,
+                kejadian_waktu=_parse_time(a.kejadian.waktu),
+                kejadian_lokasi=a.kejadian.lokasi,
+                kejadian_provinsi=a.kejadian.provinsi,
+                kronologi=a.kronologi,
+                jenis_kasus=a.jenis_kasus,
+                kerugian_materil=a.kerugian.materil,
+                kerugian_immateril=a.kerugian.immateril,
+                bukti_fisik=a.bukti.fisik,
+                bukti_dokumen=a.bukti.dokumen,
+                bukti_saksi=a.bukti.saksi,
+                bukti_digital=a.bukti.digital,
+                executive_summary=a.summary.executive_summary,
+                key_points=a.summary.key_points,
+                tingkat_urgensi=a.summary.tingkat_urgensi,
+                alasan_urgensi=a.summary.alasan_urgensi,
+                missing_information=a.summary.missing_information,
+                kelengkapan_laporan=a.quality.kelengkapan_laporan,
+                kualitas_bukti=a.quality.kualitas_bukti,
+                kompleksitas_kasus=a.quality.kompleksitas_kasus,
+                full_analysis_json=a.to_json_dict(),
                 analyzed_by='AI-Gemini',
-                analysis_duration_seconds=analysis_result.get('_metadata', {}).get('analysis_duration_seconds')
+                analysis_duration_seconds=a.metadata.get('analysis_duration_seconds')
             )
             
-            analysis_data = self.db.create_analysis_result(analysis_model)
-            analysis_id = analysis_data['id']
-            
             # ═══════════════════════════════════════════════════════
-            # STEP 5: Save Legal Articles
+            # STEP 5: Prepare Legal Articles
             # ═══════════════════════════════════════════════════════
-            print("\n💼 Saving legal articles...")
-            
-            articles_to_save = analysis_result.get('pasal_utama', []) + analysis_result.get('pasal_alternatif', [])
+            articles = []
             
-            for i, article_data in enumerate(articles_to_save):
+            for i, article_data in enumerate(a.pasal_utama + a.pasal_alternatif):
+                # Pasal tanpa nomor/sumber hukum (null dari Gemini) dilewati
+                if not article_data.pasal_number or not article_data.sumber_hukum:
+                    logger.warning(f"⚠ Skipping legal article without pasal_number/sumber_hukum: {article_data}")
+                    continue
+                
                 # Tentukan tipe artikel jika tidak ada
-                article_type = article_data.get('article_type')
+                article_type = article_data.article_type
                 if not article_type:
-                    article_type = 'utama' if i < len(analysis_result.get('pasal_utama', [])) else 'alternatif'
+                    article_type = 'utama' if i < len(a.pasal_utama) else 'alternatif'
 
                 # Tentukan is_primary
-                is_primary = article_data.get('is_primary', (article_type == 'utama'))
+                is_primary = article_data.is_primary
+                if is_primary is None:
+                    is_primary = article_type == 'utama'
 
                 article = LegalArticle(
-                    analysis_id=analysis_id,
-                    pasal_number=article_data.get('pasal_number'),
-                    sumber_hukum=article_data.get('sumber_hukum'),
-                    judul_pasal=article_data.get('judul_pasal'),
-                    bunyi_pasal=article_data.get('bunyi_pasal'),
-                    elemen_konstitutif=article_data.get('elemen_konstitutif'),
-                    elemen_terpenuhi=article_data.get('elemen_terpenuhi'),
-                    confidence_score=article_data.get('confidence_score', 0.5),
-                    confidence_level=article_data.get('confidence_level', 'Sedang'),
-                    reasoning=article_data.get('reasoning') or article_data.get('alasan'),
+                    pasal_number=article_data.pasal_number,
+                    sumber_hukum=article_data.sumber_hukum,
+                    judul_pasal=article_data.judul_pasal,
+                    bunyi_pasal=article_data.bunyi_pasal,
+                    elemen_konstitutif=article_data.elemen_konstitutif,
+                    elemen_terpenuhi=article_data.elemen_terpenuhi,
+                    confidence_score=min(max(article_data.confidence_score, 0.0), 1.0),
+                    confidence_level=article_data.confidence_level,
+                    reasoning=article_data.reasoning or article_data.alasan,
                     is_primary=is_primary,
                     article_type=article_type
                 )
-                self.db.create_legal_article(article)
-            
-            print(f"✓ Saved {len(articles_to_save)} legal articles")
+                articles.append(article)
             
             # ═══════════════════════════════════════════════════════
-            # STEP 6: Save Recommendations
+            # STEP 6: Prepare Recommendations
             # ═══════════════════════════════════════════════════════
-            print("\n📋 Saving recommendations...")
-            
-            for rec_data in analysis_result.get('recommendations', []):
-                recommendation = Recommendation(
-                    analysis_id=analysis_id,
-                    recommendation_text=rec_data.get('text'),
-                    priority=rec_data.get('priority', 'Normal'),
-                    category=rec_data.get('category')
+            recommendations = [
+                Recommendation(
+                    recommendation_text=rec_data.text,
+                    priority=rec_data.priority or 'Normal',
+                    category=rec_data.category
                 )
-                self.db.create_recommendation(recommendation)
-            
-            print(f"✓ Saved {len(analysis_result.get('recommendations', []))} recommendations")
+                for rec_data in a.recommendations
+            ]
             
             # ═══════════════════════════════════════════════════════
-            # STEP 7: Update Status & Log
+            # STEP 7: Save Everything, Update Status & Log (one transaction)
             # ═══════════════════════════════════════════════════════
-            self.db.update_complaint_status(complaint_id, 'analyzed')
-            self.db.log_action(
-                complaint_id=complaint_id,
-                analysis_id=analysis_id,
-                action='ANALYSIS_COMPLETED',
-                action_by='system',
-                details=f'Analysis ID: {analysis_id}'
+            analysis_id = self.db.save_full_analysis(
+                analysis_model,
+                articles,
+                recommendations,
+                status='analyzed',
+                logs=[{
+                    'action': 'ANALYSIS_COMPLETED',
+                    'action_by': 'system',
+                    'details': 'Analysis saved with legal articles and recommendations'
+                }]
+            )
+            logger.debug(
+                f"✓ Saved analysis {analysis_id} with {len(articles)} legal articles "
+                f"and {len(recommendations)} recommendations"
             )
             
             # ═══════════════════════════════════════════════════════
@@ -235,16 +603,15 @@ class LegalComplaintProcessor:
             end_time = datetime.now()
             total_duration = (end_time - start_time).total_seconds()
             
-            print_section_header("✅ PROCESSING COMPLETE")
-            print(f"Complaint Number  : {complaint_number}")
-            print(f"Complaint ID      : {complaint_id}")
-            print(f"Analysis ID       : {analysis_id}")
-            print(f"Pelapor           : {analysis_result.get('pelapor', {}).get('nama', 'N/A')}")
-            print(f"Jenis Kasus       : {analysis_result.get('jenis_kasus', 'N/A')}")
-            print(f"Tingkat Urgensi   : {analysis_result.get('summary', {}).get('tingkat_urgensi', 'N/A')}")
-            print(f"Pasal Utama       : {len(analysis_result.get('pasal_utama', []))} pasal")
-            print(f"Total Duration    : {total_duration:.2f} seconds")
-            print_separator()
+            logger.info(
+                "Processing complete: complaint_number=%s complaint_id=%s analysis_id=%s "
+                "jenis_kasus=%s tingkat_urgensi=%s pasal_utama=%d duration=%.2fs",
+                complaint_number, complaint_id, analysis_id,
+                a.jenis_kasus or 'N/A',
+                a.summary.tingkat_urgensi or 'N/A',
+                len(a.pasal_utama),
+                total_duration
+            )
             
             return {
                 'success': True,
@@ -255,25 +622,28 @@ class LegalComplaintProcessor:
             }
             
         except Exception as e:
-            print(f"\n✗ Error during processing: {e}")
-            import traceback
-            traceback.print_exc()
+            return self._handle_processing_error(e, complaint_id, analysis_id)
+    
+    def _handle_processing_error(self, error: Exception, complaint_id: Optional[str],
+                                 analysis_id: Optional[str]) -> dict:
+        """Log a pipeline error and mark the complaint as failed"""
+        logger.exception(f"✗ Error during processing: {error}")
+        
+        # Coba log error ke DB jika complaint_id sudah ada
+        try:
+            if complaint_id:
+                self.db.update_complaint_status(complaint_id, 'error')
+                self.db.log_action(
+                    complaint_id=complaint_id,
+                    analysis_id=analysis_id,
+                    action='PROCESSING_ERROR',
+                    action_by='system',
+                    details=str(error)
+                )
+        except Exception as db_e:
+            logger.error(f"✗ Failed to log processing error to DB: {db_e}")
             
-            # Coba log error ke DB jika complaint_id sudah ada
-            try:
-                if complaint_id:
-                    self.db.update_complaint_status(complaint_id, 'error')
-                    self.db.log_action(
-                        complaint_id=complaint_id,
-                        analysis_id=analysis_id,
-                        action='PROCESSING_ERROR',
-                        action_by='system',
-                        details=str(e)
-                    )
-            except Exception as db_e:
-                print(f"✗ Failed to log processing error to DB: {db_e}")
-                
-            return {'success': False, 'error': str(e)}
+        return {'success': False, 'error': str(error)}
 
 # Bagian ini HANYA akan berjalan jika Anda menjalankan `python main.py`
 # Bagian ini TIDAK akan berjalan saat diimpor oleh `api_server.py`
@@ -288,6 +658,11 @@ if __name__ == "__main__":
     
     pdf_path = sys.argv[1]
     
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    
     # Initialize processor
     try:
         processor = LegalComplaintProcessor()
@@ -3,35 +3,134 @@ AI Analysis Module
 Handles AI-powered analysis of complaint documents using Gemini API
 """
 import os
-import json
 import time
-from typing import Dict, Any, Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, List, Set, Tuple
 from datetime import datetime
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable, DeadlineExceeded
 from dotenv import load_dotenv
+from pydantic import ValidationError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 
-load_dotenv()
+from src.models import GeminiAnalysis
 
+# .env is only for local runs; skipped when the platform provides the key
+if not os.getenv('GEMINI_API_KEY'):
+    load_dotenv()
 
-class LegalAIAnalyzer:
-    """AI-powered legal document analyzer using Gemini"""
-    
-    def __init__(self, api_key: Optional[str] = None):
-        """
-        Initialize AI Analyzer
-        
-        Args:
-            api_key: Gemini API key (optional, will use env var if not provided)
-        """
-        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        
-        if not self.api_key:
-            raise ValueError("Gemini API key not found. Set GEMINI_API_KEY in .env file")
-        
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        self.system_instruction = """
+# Micro-batching defaults for AsyncBatcher
+MAX_BATCH = 8
+BATCH_WINDOW_SECONDS = 0.15
+
+# Concurrent Gemini calls for analyze_many
+DEFAULT_CONCURRENCY = 16
+
+# Longest document sent to Gemini (~4 characters per token, ~100k tokens);
+# longer texts keep their beginning and end, where identities and signatures are
+MAX_DOCUMENT_CHARS = 400_000
+
+# Gemini errors worth retrying (429, 503, timeouts), with jittered backoff
+TRANSIENT_GEMINI_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded)
+MAX_GEMINI_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+
+# After this many analyses fail on transient errors in a row, stop calling
+# Gemini for CIRCUIT_RESET_SECONDS instead of queueing more doomed retries
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 60.0
+
+# Appended once when a response does not match the schema (e.g. truncated)
+JSON_REPROMPT = "\n\nKembalikan HANYA JSON yang valid sesuai skema, tanpa teks lain."
+
+_gemini_retry = retry(
+    retry=retry_if_exception_type(TRANSIENT_GEMINI_ERRORS),
+    wait=wait_random_exponential(multiplier=RETRY_BASE_DELAY_SECONDS, max=RETRY_MAX_DELAY_SECONDS),
+    stop=stop_after_attempt(MAX_GEMINI_ATTEMPTS),
+    reraise=True,
+)
+
+# Gemini structured-output schema mirroring src.models.GeminiAnalysis.
+# With response_mime_type="application/json" the model can only emit JSON
+# matching it, so the prompt carries no output-format instructions.
+_STRING = {"type": "string", "nullable": True}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+
+def _enum(*values: str) -> dict:
+    """String schema restricted to the given values"""
+    return {"type": "string", "format": "enum", "enum": list(values)}
+
+
+def _object(properties: dict, required: Optional[List[str]] = None) -> dict:
+    """Object schema; every property is required unless listed otherwise"""
+    return {"type": "object", "properties": properties,
+            "required": required or list(properties)}
+
+
+_PASAL_SCHEMA = _object({
+    "pasal_number": _STRING,
+    "sumber_hukum": _STRING,
+    "judul_pasal": _STRING,
+    "bunyi_pasal": _STRING,
+    "elemen_konstitutif": _STRING_LIST,
+    "elemen_terpenuhi": {"type": "array", "items": _object({
+        "elemen": _STRING,
+        "fakta_pendukung": _STRING,
+        "status": _STRING,
+    })},
+    "confidence_score": {"type": "number"},
+    "confidence_level": _enum("Tinggi", "Sedang", "Rendah"),
+    "reasoning": _STRING,
+    "is_primary": {"type": "boolean"},
+    "article_type": _enum("utama", "alternatif", "pemberatan", "terkait"),
+})
+
+ANALYSIS_RESPONSE_SCHEMA = _object({
+    "pelapor": _object({"nama": _STRING, "ktp": _STRING, "kontak": _STRING}),
+    "terlapor": _object({"nama": _STRING, "identitas": _STRING, "ciri": _STRING}),
+    "kejadian": _object({
+        "tanggal": _STRING,
+        "waktu": _STRING,
+        "lokasi": _STRING,
+        "provinsi": _STRING,
+    }),
+    "kronologi": _STRING,
+    "jenis_kasus": _STRING,
+    "kerugian": _object({"materil": {"type": "number", "nullable": True},
+                         "immateril": _STRING}),
+    "bukti": _object({
+        "fisik": _STRING_LIST,
+        "dokumen": _STRING_LIST,
+        "saksi": _STRING_LIST,
+        "digital": _STRING_LIST,
+    }),
+    "pasal_utama": {"type": "array", "items": _PASAL_SCHEMA},
+    "pasal_alternatif": {"type": "array", "items": _PASAL_SCHEMA},
+    "summary": _object({
+        "executive_summary": _STRING,
+        "key_points": _STRING_LIST,
+        "tingkat_urgensi": _enum("Tinggi", "Sedang", "Rendah"),
+        "alasan_urgensi": _STRING,
+        "missing_information": _STRING_LIST,
+    }),
+    "quality": _object({
+        "kelengkapan_laporan": _enum("Lengkap", "Tidak Lengkap", "Parsial"),
+        "kualitas_bukti": _enum("Kuat", "Sedang", "Lemah"),
+        "kompleksitas_kasus": _enum("Tinggi", "Sedang", "Rendah"),
+    }),
+    "recommendations": {"type": "array", "items": _object({
+        "text": _STRING,
+        "priority": _enum("Urgent", "Normal", "Low"),
+        "category": _STRING,
+    })},
+})
+
+MODEL_NAME = 'gemini-2.0-flash'
+
+SYSTEM_INSTRUCTION = """
 Anda adalah AI Legal Assistant bernama "LegalAnalyzer" yang ahli dalam menganalisis laporan pengaduan berdasarkan sistem hukum Indonesia.
 
 TUGAS UTAMA:
@@ -49,114 +148,121 @@ BATASAN:
 ⚠️ Hanya memberikan REKOMENDASI, bukan keputusan hukum final
 ⚠️ Output harus divalidasi oleh ahli hukum
 ⚠️ Tidak membuat informasi palsu (no hallucination)
-
-OUTPUT: Harus berupa VALID JSON tanpa markdown formatting.
 """
+
+GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=0.2,  # Low for consistency
+    max_output_tokens=4000,
+    top_p=0.9,
+    response_mime_type="application/json",
+    response_schema=ANALYSIS_RESPONSE_SCHEMA,
+)
+
+# GenerativeModel per model name, shared by every analyzer in the process
+_models: Dict[str, genai.GenerativeModel] = {}
+
+# API key the SDK is currently configured with. genai.configure() drops the
+# SDK's cached clients (and their open HTTP/2 gRPC channels), so it is only
+# called again when the key changes.
+_configured_api_key: Optional[str] = None
+
+
+def _fit_document(document_text: str, max_chars: int = MAX_DOCUMENT_CHARS) -> str:
+    """Trim a document to max_chars, keeping its head and tail"""
+    if len(document_text) <= max_chars:
+        return document_text
     
-    def create_analysis_prompt(self, document_text: str) -> str:
-        """Create structured prompt for analysis"""
-        
-        prompt = f"""
-{self.system_instruction}
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    omitted = len(document_text) - head - tail
+    return (
+        f"{document_text[:head]}\n\n[... {omitted} karakter dihilangkan ...]\n\n"
+        f"{document_text[-tail:]}"
+    )
+
+
+def _configure_genai(api_key: str) -> None:
+    """Configure the Gemini SDK once per process and API key"""
+    global _configured_api_key
+    
+    if api_key != _configured_api_key:
+        genai.configure(api_key=api_key)
+        _configured_api_key = api_key
+        # Models bind the SDK client on first use, so drop the old ones
+        _models.clear()
 
-Analisis laporan pengaduan berikut dan berikan output dalam format JSON:
+
+def _get_model(model_name: str) -> genai.GenerativeModel:
+    """Shared GenerativeModel with the system instruction and generation config"""
+    model = _models.get(model_name)
+    if model is None:
+        model = genai.GenerativeModel(
+            model_name,
+            system_instruction=SYSTEM_INSTRUCTION,
+            generation_config=GENERATION_CONFIG,
+        )
+        _models[model_name] = model
+    return model
+
+
+class LegalAIAnalyzer:
+    """AI-powered legal document analyzer using Gemini"""
+    
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Initialize AI Analyzer
+        
+        Args:
+            api_key: Gemini API key (optional, will use env var if not provided)
+        """
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        
+        if not self.api_key:
+            raise ValueError("Gemini API key not found. Set GEMINI_API_KEY in .env file")
+        
+        _configure_genai(self.api_key)
+        self.model_name = MODEL_NAME
+        self.model = _get_model(self.model_name)
+        
+        # Circuit breaker state (see _record_transient_failure)
+        self._consecutive_failures = 0
+        self._circuit_open_until = 0.0
+        
+        self.system_instruction = SYSTEM_INSTRUCTION
+        
+        # Static prompt parts around the document text (the system
+        # instruction is sent separately by the model, see _get_model)
+        self._prompt_prefix = """
+Analisis laporan pengaduan berikut:
 
 ═══════════════════════════════════════════════════════════════
 DOKUMEN LAPORAN PENGADUAN:
 ═══════════════════════════════════════════════════════════════
 
-{document_text}
+"""
+        
+        self._prompt_suffix = """
 
 ═══════════════════════════════════════════════════════════════
-OUTPUT FORMAT (HARUS VALID JSON):
+KETENTUAN PENGISIAN:
 ═══════════════════════════════════════════════════════════════
 
-{{
-  "pelapor": {{
-    "nama": "",
-    "ktp": "",
-    "kontak": ""
-  }},
-  "terlapor": {{
-    "nama": "",
-    "identitas": "",
-    "ciri": ""
-  }},
-  "kejadian": {{
-    "tanggal": "YYYY-MM-DD",
-    "waktu": "HH:MM",
-    "lokasi": "",
-    "provinsi": ""
-  }},
-  "kronologi": "",
-  "jenis_kasus": "",
-  "kerugian": {{
-    "materil": 0.0,
-    "immateril": ""
-  }},
-  "bukti": {{
-    "fisik": [],
-    "dokumen": [],
-    "saksi": [],
-    "digital": []
-  }},
-  "pasal_utama": [
-    {{
-      "pasal_number": "",
-      "sumber_hukum": "",
-      "judul_pasal": "",
-      "bunyi_pasal": "",
-      "elemen_konstitutif": [],
-      "elemen_terpenuhi": [
-        {{
-          "elemen": "",
-          "fakta_pendukung": "",
-          "status": "terpenuhi"
-        }}
-      ],
-      "confidence_score": 0.0,
-      "confidence_level": "Tinggi",
-      "reasoning": "",
-      "is_primary": true,
-      "article_type": "utama"
-    }}
-  ],
-  "pasal_alternatif": [],
-  "summary": {{
-    "executive_summary": "",
-    "key_points": [],
-    "tingkat_urgensi": "Sedang",
-    "alasan_urgensi": "",
-    "missing_information": []
-  }},
-  "quality": {{
-    "kelengkapan_laporan": "Lengkap",  // MUST be: "Lengkap", "Tidak Lengkap", or "Parsial"
-    "kualitas_bukti": "Kuat",          // MUST be: "Kuat", "Sedang", or "Lemah"
-    "kompleksitas_kasus": "Sedang"     // MUST be: "Tinggi", "Sedang", or "Rendah"
-  }},
-  "recommendations": [
-    {{
-      "text": "",
-      "priority": "Normal",
-      "category": ""
-    }}
-  ]
-}}
-
-PENTING:
-- Response harus VALID JSON tanpa markdown code blocks (```
-- Semua field harus terisi, gunakan null atau [] jika tidak ada data
-- confidence_score harus float antara 0.0 - 1.0
-- Tanggal format: YYYY-MM-DD
-- Waktu format: HH:MM
-- kelengkapan_laporan HARUS salah satu dari: "Lengkap", "Tidak Lengkap", "Parsial"
-- kualitas_bukti HARUS salah satu dari: "Kuat", "Sedang", "Lemah"
-- kompleksitas_kasus HARUS salah satu dari: "Tinggi", "Sedang", "Rendah"
-- tingkat_urgensi HARUS salah satu dari: "Tinggi", "Sedang", "Rendah"
+- Gunakan null atau [] jika data tidak ada di dokumen
+- confidence_score antara 0.0 - 1.0
+- Tanggal format: YYYY-MM-DD, waktu format: HH:MM
 """
-        return prompt
     
-    def analyze(self, document_text: str) -> Optional[Dict[str, Any]]:
+    def create_analysis_prompt(self, document_text: str) -> List[str]:
+        """
+        Create structured prompt for analysis
+        
+        The instructions, document and filling rules are returned as separate
+        parts so the (possibly huge) document text is never copied into one
+        concatenated prompt string. The static parts are built once in __init__.
+        """
+        return [self._prompt_prefix, _fit_document(document_text), self._prompt_suffix]
+    
+    def analyze(self, document_text: str) -> Optional[GeminiAnalysis]:
         """
         Analyze complaint document
         
@@ -164,10 +270,14 @@ PENTING:
             document_text: Extracted text from PDF
             
         Returns:
-            Analysis result as dictionary or None if failed
+            Parsed analysis result or None if failed
         """
         print("\n🤖 Starting AI analysis...")
-        start_time = time.time()
+        start_time = time.perf_counter()
+        
+        if self._circuit_open():
+            print("  ✗ Gemini temporarily unavailable, skipping analysis")
+            return None
         
         try:
             # Create prompt
@@ -175,54 +285,178 @@ PENTING:
             
             # Call Gemini API
             print("  → Calling Gemini API...")
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.2,  # Low for consistency
-                    max_output_tokens=4000,
-                    top_p=0.9,
-                )
-            )
-            
-            # Parse response
-            result_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if result_text.startswith('```'):
-                lines = result_text.split('\n')
-                result_text = '\n'.join(lines[1:-1])  # Remove first and last line
-                if result_text.startswith('json'):
-                    result_text = result_text[4:].strip()
-            
-            # Parse JSON
-            analysis_result = json.loads(result_text)
-            
-            # Calculate duration
-            duration = int(time.time() - start_time)
-            analysis_result['_metadata'] = {
-                'analysis_duration_seconds': duration,
-                'analyzed_at': datetime.now().isoformat(),
-                'model': 'gemini-1.5-pro-latest'
-            }
-            
-            print(f"  ✓ Analysis completed in {duration} seconds")
-            return analysis_result
-            
-        except json.JSONDecodeError as e:
-            print(f"  ✗ Error parsing JSON response: {e}")
-            print(f"  Response text: {result_text[:500]}...")
+            response = self._call_gemini(prompt)
+            result = self._parse_response(response.text, start_time)
+            
+            if result is None:
+                print("  → Asking Gemini again for valid JSON...")
+                response = self._call_gemini(prompt + [JSON_REPROMPT])
+                result = self._parse_response(response.text, start_time)
+            
+            return result
+            
+        except TRANSIENT_GEMINI_ERRORS as e:
+            self._record_transient_failure()
+            print(f"  ✗ Gemini unavailable after {MAX_GEMINI_ATTEMPTS} attempts: {e}")
+            return None
+        except Exception as e:
+            print(f"  ✗ Error during analysis: {e}")
+            return None
+    
+    async def analyze_async(self, document_text: str) -> Optional[GeminiAnalysis]:
+        """
+        Analyze complaint document without blocking the event loop
+        
+        Args:
+            document_text: Extracted text from PDF
+            
+        Returns:
+            Parsed analysis result or None if failed
+        """
+        start_time = time.perf_counter()
+        
+        if self._circuit_open():
+            print("  ✗ Gemini temporarily unavailable, skipping analysis")
             return None
+        
+        try:
+            prompt = self.create_analysis_prompt(document_text)
+            response = await self._call_gemini_async(prompt)
+            result = self._parse_response(response.text, start_time)
+            
+            if result is None:
+                response = await self._call_gemini_async(prompt + [JSON_REPROMPT])
+                result = self._parse_response(response.text, start_time)
             
+            return result
+            
+        except TRANSIENT_GEMINI_ERRORS as e:
+            self._record_transient_failure()
+            print(f"  ✗ Gemini unavailable after {MAX_GEMINI_ATTEMPTS} attempts: {e}")
+            return None
         except Exception as e:
             print(f"  ✗ Error during analysis: {e}")
             return None
     
-    def validate_analysis(self, analysis: Dict[str, Any]) -> bool:
+    def analyze_batch(self, documents: List[str]) -> List[Optional[GeminiAnalysis]]:
+        """
+        Analyze several complaint documents concurrently
+        
+        Args:
+            documents: Extracted texts, one per complaint
+            
+        Returns:
+            Analysis results in the same order as documents (None where failed)
+        """
+        if len(documents) <= 1:
+            return [self.analyze(document) for document in documents]
+        
+        # The sync SDK client is thread-safe; each request waits on the network
+        with ThreadPoolExecutor(max_workers=min(len(documents), MAX_BATCH)) as executor:
+            return list(executor.map(self.analyze, documents))
+    
+    async def analyze_batch_async(self, documents: List[str]) -> List[Optional[GeminiAnalysis]]:
+        """
+        Analyze several complaint documents concurrently without blocking the event loop
+        
+        Args:
+            documents: Extracted texts, one per complaint
+            
+        Returns:
+            Analysis results in the same order as documents (None where failed)
+        """
+        return await self.analyze_many(documents, concurrency=MAX_BATCH)
+    
+    async def analyze_many(self, documents: List[str],
+                           concurrency: int = DEFAULT_CONCURRENCY) -> List[Optional[GeminiAnalysis]]:
+        """
+        Analyze many complaint documents with at most `concurrency` Gemini calls in flight
+        
+        Args:
+            documents: Extracted texts, one per complaint
+            concurrency: Maximum number of simultaneous Gemini requests
+            
+        Returns:
+            Analysis results in the same order as documents (None where failed)
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def analyze_one(document: str) -> Optional[GeminiAnalysis]:
+            async with semaphore:
+                return await self.analyze_async(document)
+        
+        return list(await asyncio.gather(*[analyze_one(document) for document in documents]))
+    
+    @_gemini_retry
+    def _call_gemini(self, prompt: List[str]):
+        """Call Gemini, retrying transient errors with jittered backoff"""
+        response = self.model.generate_content(prompt)
+        self._consecutive_failures = 0
+        return response
+    
+    @_gemini_retry
+    async def _call_gemini_async(self, prompt: List[str]):
+        """Async variant of _call_gemini"""
+        response = await self.model.generate_content_async(prompt)
+        self._consecutive_failures = 0
+        return response
+    
+    def _circuit_open(self) -> bool:
+        """True while Gemini calls are suspended after repeated failures"""
+        return time.monotonic() < self._circuit_open_until
+    
+    def _record_transient_failure(self) -> None:
+        """Count an analysis lost to transient errors; open the circuit at the threshold"""
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+            self._circuit_open_until = time.monotonic() + CIRCUIT_RESET_SECONDS
+            self._consecutive_failures = 0
+            print(f"  ⚠ Gemini failing repeatedly, pausing calls for {CIRCUIT_RESET_SECONDS:.0f}s")
+    
+    def _parse_response(self, response_text: str, start_time: float) -> Optional[GeminiAnalysis]:
+        """
+        Parse Gemini response text into a GeminiAnalysis
+        
+        Args:
+            response_text: Raw response text from Gemini
+            start_time: Time the analysis started (time.perf_counter())
+            
+        Returns:
+            Parsed analysis result or None if the JSON is invalid
+        """
+        # Parse and validate JSON in one pass
+        try:
+            analysis_result = GeminiAnalysis.model_validate_json(response_text)
+        except ValidationError as e:
+            print(f"  ✗ Error parsing JSON response: {e}")
+            print(f"  Response text: {response_text[:500]}...")
+            return None
+        
+        # Calculate duration
+        duration = int(time.perf_counter() - start_time)
+        analysis_result.metadata = {
+            'analysis_duration_seconds': duration,
+            'analyzed_at': datetime.now().isoformat(),
+            'model': self.model_name
+        }
+        
+        print(f"  ✓ Analysis completed in {duration} seconds")
+        return analysis_result
+    
+    def ping(self) -> bool:
+        """Send a 1-token request so the Gemini client and connection are ready"""
+        self.model.generate_content(
+            "ping",
+            generation_config=genai.types.GenerationConfig(max_output_tokens=1)
+        )
+        return True
+    
+    def validate_analysis(self, analysis: GeminiAnalysis) -> bool:
         """
         Validate analysis result structure
         
         Args:
-            analysis: Analysis result dictionary
+            analysis: Parsed analysis result
             
         Returns:
             True if valid, False otherwise
@@ -230,8 +464,122 @@ PENTING:
         required_keys = ['pelapor', 'terlapor', 'kejadian', 'jenis_kasus', 'pasal_utama', 'summary']
         
         for key in required_keys:
-            if key not in analysis:
+            if key not in analysis.model_fields_set:
                 print(f"  ⚠ Missing required key: {key}")
                 return False
         
         return True
+
+
+
+class AsyncBatcher:
+    """
+    Micro-batching queue for Gemini analyses
+    
+    Concurrent submissions that arrive within a short window are collected
+    into one batch and sent to Gemini together, then each caller receives
+    its own result.
+    """
+    
+    def __init__(self, analyzer: LegalAIAnalyzer, max_batch: int = MAX_BATCH,
+                 max_wait: float = BATCH_WINDOW_SECONDS):
+        """
+        Initialize batcher
+        
+        Args:
+            analyzer: Analyzer used to run each batch
+            max_batch: Maximum number of documents per batch
+            max_wait: Seconds to wait for more documents before flushing
+        """
+        self.analyzer = analyzer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+    
+    def start(self) -> None:
+        """Start the background worker on the running event loop"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the background worker and fail any pending submissions"""
+        if self._worker is None:
+            return
+        
+        self._worker.cancel()
+        for task in list(self._inflight):
+            task.cancel()
+        await asyncio.gather(self._worker, *self._inflight, return_exceptions=True)
+        
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+        
+        self._worker = None
+    
+    async def submit(self, document_text: str) -> Optional[GeminiAnalysis]:
+        """
+        Queue a document for analysis and wait for its result
+        
+        Args:
+            document_text: Extracted text from PDF
+            
+        Returns:
+            Parsed analysis result or None if failed
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((document_text, future))
+        return await future
+    
+    async def _run(self) -> None:
+        """Drain the queue in batches of up to max_batch documents"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            
+            try:
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.cancel()
+                raise
+            
+            # Dispatch without waiting so the next batch can form meanwhile
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+    
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Send one batch to Gemini and resolve each caller's future"""
+        print(f"  → Sending batch of {len(batch)} document(s) to Gemini...")
+        try:
+            results = await self.analyzer.analyze_batch_async([text for text, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
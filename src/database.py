@@ -2,20 +2,59 @@
 Database Operations Module
 Handles all interactions with Supabase database
 """
-import json
+import os
+import time
+import queue
+import atexit
+import threading
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 
+import zstandard as zstd
+from postgrest.types import ReturnMethod
+
 from config.database_config import supabase
 from src.models import Complaint, AnalysisResult, LegalArticle, Recommendation
 
+# How long a cached AI analysis stays valid
+ANALYSIS_CACHE_TTL_DAYS = int(os.getenv('ANALYSIS_CACHE_TTL_DAYS', '30'))
+
+# extracted_text is stored zstd-compressed (bytea) to shrink inserts and storage
+_TEXT_COMPRESSOR = zstd.ZstdCompressor(level=3)
+_TEXT_DECOMPRESSOR = zstd.ZstdDecompressor()
+
+
+def _compress_text(text: str) -> str:
+    """Compress text with zstd and encode it as a PostgREST bytea literal"""
+    return '\\x' + _TEXT_COMPRESSOR.compress(text.encode('utf-8')).hex()
+
+
+def _decompress_row(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Restore extracted_text in a complaints row that stores it compressed"""
+    if row and row.get('text_encoding') == 'zstd' and row.get('extracted_text_compressed'):
+        compressed = bytes.fromhex(row.pop('extracted_text_compressed')[2:])
+        row['extracted_text'] = _TEXT_DECOMPRESSOR.decompress(compressed).decode('utf-8')
+    return row
+
+# Audit logs are written by a background thread in batches of up to
+# LOG_BATCH_SIZE rows, at most LOG_FLUSH_INTERVAL_SECONDS after they are queued
+LOG_BATCH_SIZE = 100
+LOG_FLUSH_INTERVAL_SECONDS = 0.5
+LOG_SHUTDOWN_TIMEOUT_SECONDS = 5.0
+
+# Queued after the last log entry to make the writer flush and exit
+_LOG_STOP = object()
 
 class DatabaseManager:
     """Manages all database operations for the Legal Complaint Analyzer"""
     
     def __init__(self):
         self.client = supabase
+        self.storage_bucket = os.getenv('SUPABASE_STORAGE_BUCKET')
+        self._log_queue: "queue.Queue" = queue.Queue()
+        self._log_thread: Optional[threading.Thread] = None
+        self._log_thread_lock = threading.Lock()
     
     # ═══════════════════════════════════════════════════════════
     # COMPLAINTS OPERATIONS
@@ -37,14 +76,17 @@ class DatabaseManager:
                 'pdf_filename': complaint.pdf_filename,
                 'pdf_path': complaint.pdf_path,
                 'pdf_url': complaint.pdf_url,
-                'extracted_text': complaint.extracted_text,
                 'status': complaint.status,
                 'uploaded_by': complaint.uploaded_by
             }
             
+            if complaint.extracted_text:
+                data['extracted_text_compressed'] = _compress_text(complaint.extracted_text)
+                data['text_encoding'] = 'zstd'
+            
             response = self.client.table('complaints').insert(data).execute()
             print(f"✓ Complaint created with ID: {response.data[0]['id']}")
-            return response.data[0]
+            return _decompress_row(response.data[0])
             
         except Exception as e:
             print(f"✗ Error creating complaint: {e}")
@@ -53,8 +95,8 @@ class DatabaseManager:
     def get_complaint_by_id(self, complaint_id: str) -> Optional[Dict[str, Any]]:
         """Get complaint by ID"""
         try:
-            response = self.client.table('complaints').select("*").eq('id', complaint_id).execute()
-            return response.data[0] if response.data else None
+            response = self.client.table('complaints').select("*").eq('id', complaint_id).maybe_single().execute()
+            return _decompress_row(response.data) if response and response.data else None
         except Exception as e:
             print(f"✗ Error getting complaint: {e}")
             return None
@@ -62,8 +104,8 @@ class DatabaseManager:
     def get_complaint_by_number(self, complaint_number: str) -> Optional[Dict[str, Any]]:
         """Get complaint by complaint number"""
         try:
-            response = self.client.table('complaints').select("*").eq('complaint_number', complaint_number).execute()
-            return response.data[0] if response.data else None
+            response = self.client.table('complaints').select("*").eq('complaint_number', complaint_number).maybe_single().execute()
+            return _decompress_row(response.data) if response and response.data else None
         except Exception as e:
             print(f"✗ Error getting complaint: {e}")
             return None
@@ -81,6 +123,18 @@ class DatabaseManager:
             print(f"✗ Error updating complaint status: {e}")
             return False
     
+    def update_complaint_pdf_url(self, complaint_id: str, pdf_url: str) -> bool:
+        """Attach the Storage URL of the uploaded PDF to a complaint"""
+        try:
+            self.client.table('complaints').update({
+                'pdf_url': pdf_url,
+                'updated_at': datetime.now().isoformat()
+            }).eq('id', complaint_id).execute()
+            return True
+        except Exception as e:
+            print(f"✗ Error updating complaint PDF URL: {e}")
+            return False
+    
     def get_all_complaints(self, limit: int = 100, status: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get all complaints with optional status filter"""
         try:
@@ -90,7 +144,7 @@ class DatabaseManager:
                 query = query.eq('status', status)
             
             response = query.execute()
-            return response.data
+            return [_decompress_row(row) for row in response.data]
         except Exception as e:
             print(f"✗ Error getting complaints: {e}")
             return []
@@ -99,41 +153,49 @@ class DatabaseManager:
     # ANALYSIS RESULTS OPERATIONS
     # ═══════════════════════════════════════════════════════════
     
+    @staticmethod
+    def _analysis_row(analysis: AnalysisResult) -> Dict[str, Any]:
+        """Serialize an AnalysisResult into an analysis_results row"""
+        row = {
+            'complaint_id': str(analysis.complaint_id),
+            'pelapor_nama': analysis.pelapor_nama,
+            'pelapor_ktp': analysis.pelapor_ktp,
+            'pelapor_kontak': analysis.pelapor_kontak,
+            'terlapor_nama': analysis.terlapor_nama,
+            'terlapor_identitas': analysis.terlapor_identitas,
+            'terlapor_ciri': analysis.terlapor_ciri,
+            'kejadian_tanggal': analysis.kejadian_tanggal.isoformat() if analysis.kejadian_tanggal else None,
+            'kejadian_waktu': analysis.kejadian_waktu.isoformat() if analysis.kejadian_waktu else None,
+            'kejadian_lokasi': analysis.kejadian_lokasi,
+            'kejadian_provinsi': analysis.kejadian_provinsi,
+            'kronologi': analysis.kronologi,
+            'jenis_kasus': analysis.jenis_kasus,
+            'kerugian_materil': analysis.kerugian_materil,
+            'kerugian_immateril': analysis.kerugian_immateril,
+            'bukti_fisik': analysis.bukti_fisik,
+            'bukti_dokumen': analysis.bukti_dokumen,
+            'bukti_saksi': analysis.bukti_saksi,
+            'bukti_digital': analysis.bukti_digital,
+            'executive_summary': analysis.executive_summary,
+            'key_points': analysis.key_points,
+            'tingkat_urgensi': analysis.tingkat_urgensi,
+            'alasan_urgensi': analysis.alasan_urgensi,
+            'missing_information': analysis.missing_information,
+            'kelengkapan_laporan': analysis.kelengkapan_laporan,
+            'kualitas_bukti': analysis.kualitas_bukti,
+            'kompleksitas_kasus': analysis.kompleksitas_kasus,
+            'full_analysis_json': analysis.full_analysis_json,
+            'analyzed_by': analysis.analyzed_by,
+            'analysis_duration_seconds': analysis.analysis_duration_seconds
+        }
+        if analysis.id:
+            row['id'] = str(analysis.id)
+        return row
+    
     def create_analysis_result(self, analysis: AnalysisResult) -> Dict[str, Any]:
         """Create analysis result record"""
         try:
-            data = {
-                'complaint_id': str(analysis.complaint_id),
-                'pelapor_nama': analysis.pelapor_nama,
-                'pelapor_ktp': analysis.pelapor_ktp,
-                'pelapor_kontak': analysis.pelapor_kontak,
-                'terlapor_nama': analysis.terlapor_nama,
-                'terlapor_identitas': analysis.terlapor_identitas,
-                'terlapor_ciri': analysis.terlapor_ciri,
-                'kejadian_tanggal': analysis.kejadian_tanggal.isoformat() if analysis.kejadian_tanggal else None,
-                'kejadian_waktu': analysis.kejadian_waktu.isoformat() if analysis.kejadian_waktu else None,
-                'kejadian_lokasi': analysis.kejadian_lokasi,
-                'kejadian_provinsi': analysis.kejadian_provinsi,
-                'kronologi': analysis.kronologi,
-                'jenis_kasus': analysis.jenis_kasus,
-                'kerugian_materil': analysis.kerugian_materil,
-                'kerugian_immateril': analysis.kerugian_immateril,
-                'bukti_fisik': analysis.bukti_fisik,
-                'bukti_dokumen': analysis.bukti_dokumen,
-                'bukti_saksi': analysis.bukti_saksi,
-                'bukti_digital': analysis.bukti_digital,
-                'executive_summary': analysis.executive_summary,
-                'key_points': analysis.key_points,
-                'tingkat_urgensi': analysis.tingkat_urgensi,
-                'alasan_urgensi': analysis.alasan_urgensi,
-                'missing_information': analysis.missing_information,
-                'kelengkapan_laporan': analysis.kelengkapan_laporan,
-                'kualitas_bukti': analysis.kualitas_bukti,
-                'kompleksitas_kasus': analysis.kompleksitas_kasus,
-                'full_analysis_json': analysis.full_analysis_json,
-                'analyzed_by': analysis.analyzed_by,
-                'analysis_duration_seconds': analysis.analysis_duration_seconds
-            }
+            data = self._analysis_row(analysis)
             
             response = self.client.table('analysis_results').insert(data).execute()
             print(f"✓ Analysis result created with ID: {response.data[0]['id']}")
@@ -143,11 +205,47 @@ class DatabaseManager:
             print(f"✗ Error creating analysis result: {e}")
             raise
     
+    def save_full_analysis(self, analysis: AnalysisResult,
+                           articles: List[LegalArticle],
+                           recommendations: List[Recommendation],
+                           status: Optional[str] = None,
+                           logs: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Save an analysis with its articles, recommendations and audit logs
+        in one transaction via the save_full_analysis database function
+        
+        Args:
+            analysis: AnalysisResult model instance
+            articles: LegalArticle instances (analysis_id is filled in server-side)
+            recommendations: Recommendation instances (analysis_id is filled in server-side)
+            status: New complaint status to set in the same transaction
+            logs: analysis_logs entries (action, action_by, details, metadata)
+            
+        Returns:
+            ID of the new analysis result
+        """
+        try:
+            payload = {
+                'analysis': self._analysis_row(analysis),
+                'articles': [self._article_row(article) for article in articles],
+                'recommendations': [self._recommendation_row(rec) for rec in recommendations],
+                'logs': logs or [],
+                'status': status
+            }
+            
+            response = self.client.rpc('save_full_analysis', {'payload': payload}).execute()
+            print(f"✓ Analysis result saved with ID: {response.data}")
+            return response.data
+            
+        except Exception as e:
+            print(f"✗ Error saving full analysis: {e}")
+            raise
+    
     def get_analysis_by_complaint_id(self, complaint_id: str) -> Optional[Dict[str, Any]]:
         """Get analysis result by complaint ID"""
         try:
-            response = self.client.table('analysis_results').select("*").eq('complaint_id', complaint_id).execute()
-            return response.data[0] if response.data else None
+            response = self.client.table('analysis_results').select("*").eq('complaint_id', complaint_id).limit(1).maybe_single().execute()
+            return response.data if response and response.data else None
         except Exception as e:
             print(f"✗ Error getting analysis: {e}")
             return None
@@ -156,29 +254,45 @@ class DatabaseManager:
     # LEGAL ARTICLES OPERATIONS
     # ═══════════════════════════════════════════════════════════
     
-    def create_legal_article(self, article: LegalArticle) -> Dict[str, Any]:
-        """Create legal article recommendation"""
+    @staticmethod
+    def _article_row(article: LegalArticle) -> Dict[str, Any]:
+        """Serialize a LegalArticle into a legal_articles row"""
+        return {
+            'analysis_id': str(article.analysis_id) if article.analysis_id else None,
+            'pasal_number': article.pasal_number,
+            'sumber_hukum': article.sumber_hukum,
+            'judul_pasal': article.judul_pasal,
+            'bunyi_pasal': article.bunyi_pasal,
+            'elemen_konstitutif': article.elemen_konstitutif,
+            'elemen_terpenuhi': article.elemen_terpenuhi,
+            'confidence_score': article.confidence_score,
+            'confidence_level': article.confidence_level,
+            'reasoning': article.reasoning,
+            'is_primary': article.is_primary,
+            'article_type': article.article_type
+        }
+    
+    def create_legal_articles(self, articles: List[LegalArticle]) -> int:
+        """
+        Create legal article recommendations in a single insert
+        
+        Args:
+            articles: LegalArticle model instances
+            
+        Returns:
+            Number of articles inserted
+        """
+        if not articles:
+            return 0
+        
         try:
-            data = {
-                'analysis_id': str(article.analysis_id),
-                'pasal_number': article.pasal_number,
-                'sumber_hukum': article.sumber_hukum,
-                'judul_pasal': article.judul_pasal,
-                'bunyi_pasal': article.bunyi_pasal,
-                'elemen_konstitutif': article.elemen_konstitutif,
-                'elemen_terpenuhi': article.elemen_terpenuhi,
-                'confidence_score': article.confidence_score,
-                'confidence_level': article.confidence_level,
-                'reasoning': article.reasoning,
-                'is_primary': article.is_primary,
-                'article_type': article.article_type
-            }
+            data = [self._article_row(article) for article in articles]
             
-            response = self.client.table('legal_articles').insert(data).execute()
-            return response.data[0]
+            self.client.table('legal_articles').insert(data, returning=ReturnMethod.minimal).execute()
+            return len(data)
             
         except Exception as e:
-            print(f"✗ Error creating legal article: {e}")
+            print(f"✗ Error creating legal articles: {e}")
             raise
     
     def get_articles_by_analysis_id(self, analysis_id: str) -> List[Dict[str, Any]]:
@@ -194,24 +308,40 @@ class DatabaseManager:
     # RECOMMENDATIONS OPERATIONS
     # ═══════════════════════════════════════════════════════════
     
-    def create_recommendation(self, recommendation: Recommendation) -> Dict[str, Any]:
-        """Create recommendation record"""
+    @staticmethod
+    def _recommendation_row(recommendation: Recommendation) -> Dict[str, Any]:
+        """Serialize a Recommendation into a recommendations row"""
+        return {
+            'analysis_id': str(recommendation.analysis_id) if recommendation.analysis_id else None,
+            'recommendation_text': recommendation.recommendation_text,
+            'priority': recommendation.priority,
+            'category': recommendation.category,
+            'status': recommendation.status,
+            'assigned_to': recommendation.assigned_to,
+            'notes': recommendation.notes
+        }
+    
+    def create_recommendations(self, recommendations: List[Recommendation]) -> int:
+        """
+        Create recommendation records in a single insert
+        
+        Args:
+            recommendations: Recommendation model instances
+            
+        Returns:
+            Number of recommendations inserted
+        """
+        if not recommendations:
+            return 0
+        
         try:
-            data = {
-                'analysis_id': str(recommendation.analysis_id),
-                'recommendation_text': recommendation.recommendation_text,
-                'priority': recommendation.priority,
-                'category': recommendation.category,
-                'status': recommendation.status,
-                'assigned_to': recommendation.assigned_to,
-                'notes': recommendation.notes
-            }
+            data = [self._recommendation_row(rec) for rec in recommendations]
             
-            response = self.client.table('recommendations').insert(data).execute()
-            return response.data[0]
+            self.client.table('recommendations').insert(data, returning=ReturnMethod.minimal).execute()
+            return len(data)
             
         except Exception as e:
-            print(f"✗ Error creating recommendation: {e}")
+            print(f"✗ Error creating recommendations: {e}")
             raise
     
     def get_recommendations_by_analysis_id(self, analysis_id: str) -> List[Dict[str, Any]]:
@@ -223,6 +353,76 @@ class DatabaseManager:
             print(f"✗ Error getting recommendations: {e}")
             return []
     
+    # ═══════════════════════════════════════════════════════════
+    # ANALYSIS CACHE OPERATIONS
+    # ═══════════════════════════════════════════════════════════
+    
+    def get_cached_analysis(self, text_hash: str, model_version: str) -> Optional[Dict[str, Any]]:
+        """Get a previous, unexpired AI analysis for the same extracted text and model"""
+        try:
+            now = datetime.now(timezone.utc).isoformat()
+            response = self.client.table('analysis_cache').select('full_analysis_json').eq('text_hash', text_hash).eq('model_version', model_version).gt('expires_at', now).maybe_single().execute()
+            return response.data['full_analysis_json'] if response and response.data else None
+        except Exception as e:
+            print(f"✗ Error getting cached analysis: {e}")
+            return None
+    
+    def save_cached_analysis(self, text_hash: str, model_version: str,
+                             analysis: Dict[str, Any]) -> bool:
+        """Store an AI analysis in the cache (replacing an expired entry)"""
+        try:
+            expires_at = datetime.now(timezone.utc) + timedelta(days=ANALYSIS_CACHE_TTL_DAYS)
+            self.client.table('analysis_cache').upsert({
+                'text_hash': text_hash,
+                'model_version': model_version,
+                'full_analysis_json': analysis,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'expires_at': expires_at.isoformat()
+            }, returning=ReturnMethod.minimal).execute()
+            return True
+        except Exception as e:
+            print(f"✗ Error saving analysis to cache: {e}")
+            return False
+    
+    # ═══════════════════════════════════════════════════════════
+    # STORAGE OPERATIONS
+    # ═══════════════════════════════════════════════════════════
+    
+    def upload_pdf(self, file_path: str, destination: str) -> Optional[str]:
+        """
+        Upload a PDF to the configured Supabase Storage bucket
+        
+        Args:
+            file_path: Local path of the PDF
+            destination: Object path inside the bucket
+            
+        Returns:
+            Public URL of the uploaded file, or None if storage is not
+            configured or the upload failed
+        """
+        if not self.storage_bucket:
+            return None
+        
+        try:
+            bucket = self.client.storage.from_(self.storage_bucket)
+            bucket.upload(destination, file_path, {'content-type': 'application/pdf'})
+            return bucket.get_public_url(destination)
+        except Exception as e:
+            print(f"✗ Error uploading PDF to storage: {e}")
+            return None
+    
+    def delete_pdf(self, destination: str) -> bool:
+        """Remove an uploaded PDF from the Storage bucket"""
+        if not self.storage_bucket:
+            return False
+        
+        try:
+            self.client.storage.from_(self.storage_bucket).remove([destination])
+            return True
+        except Exception as e:
+            print(f"✗ Error deleting PDF from storage: {e}")
+            return False
+    
     # ═══════════════════════════════════════════════════════════
     # AUDIT LOGS OPERATIONS
     # ═══════════════════════════════════════════════════════════
@@ -230,7 +430,7 @@ class DatabaseManager:
     def log_action(self, complaint_id: Optional[str], analysis_id: Optional[str], 
                    action: str, action_by: str, details: Optional[str] = None,
                    metadata: Optional[Dict[str, Any]] = None) -> bool:
-        """Create audit log entry"""
+        """Queue an audit log entry; it is inserted by the background log writer"""
         try:
             data = {
                 'complaint_id': complaint_id,
@@ -241,13 +441,67 @@ class DatabaseManager:
                 'metadata': metadata
             }
             
-            self.client.table('analysis_logs').insert(data).execute()
+            self._start_log_writer()
+            self._log_queue.put(data)
             return True
             
         except Exception as e:
             print(f"✗ Error creating log: {e}")
             return False
     
+    def flush_logs(self, timeout: float = LOG_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """Write all queued log entries and stop the log writer"""
+        with self._log_thread_lock:
+            thread = self._log_thread
+            self._log_thread = None
+        
+        if thread and thread.is_alive():
+            self._log_queue.put(_LOG_STOP)
+            thread.join(timeout)
+    
+    def _start_log_writer(self) -> None:
+        """Start the background log writer on first use"""
+        if self._log_thread is not None:
+            return
+        
+        with self._log_thread_lock:
+            if self._log_thread is None:
+                thread = threading.Thread(target=self._log_writer, name='analysis-log-writer', daemon=True)
+                thread.start()
+                self._log_thread = thread
+                atexit.register(self.flush_logs)
+    
+    def _log_writer(self) -> None:
+        """Insert queued log entries in batches until _LOG_STOP is received"""
+        while True:
+            entry = self._log_queue.get()
+            if entry is _LOG_STOP:
+                return
+            
+            batch = [entry]
+            stop = False
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL_SECONDS
+            while len(batch) < LOG_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = self._log_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if entry is _LOG_STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            
+            try:
+                self.client.table('analysis_logs').insert(batch, returning=ReturnMethod.minimal).execute()
+            except Exception as e:
+                print(f"✗ Error writing {len(batch)} log(s): {e}")
+            
+            if stop:
+                return
+    
     def get_logs_by_complaint_id(self, complaint_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """Get audit logs for a complaint"""
         try:
@@ -262,26 +516,38 @@ class DatabaseManager:
     # ═══════════════════════════════════════════════════════════
     
     def get_complaint_with_analysis(self, complaint_id: str) -> Optional[Dict[str, Any]]:
-        """Get complete complaint data with analysis and articles"""
+        """Get complete complaint data with analysis and articles (one embedded select)"""
         try:
-            # Get complaint
-            complaint = self.get_complaint_by_id(complaint_id)
-            if not complaint:
+            # The schema declares each foreign key twice, so name the
+            # constraint PostgREST should follow for every embedded table
+            response = (
+                self.client.table('complaints')
+                .select(
+                    "*,analysis_results!analysis_results_complaint_id_fkey("
+                    "*,legal_articles!legal_articles_analysis_id_fkey(*),"
+                    "recommendations!recommendations_analysis_id_fkey(*))"
+                )
+                .eq('id', complaint_id)
+                .order('confidence_score', desc=True, foreign_table='analysis_results.legal_articles')
+                .maybe_single()
+                .execute()
+            )
+            if not response or not response.data:
                 return None
             
-            # Get analysis
-            analysis = self.get_analysis_by_complaint_id(complaint_id)
+            complaint = response.data
+            analyses = complaint.pop('analysis_results', None) or []
+            analysis = analyses[0] if analyses else None
             
-            # Get legal articles if analysis exists
             articles = []
             recommendations = []
             if analysis:
-                articles = self.get_articles_by_analysis_id(analysis['id'])
-                recommendations = self.get_recommendations_by_analysis_id(analysis['id'])
+                articles = analysis.pop('legal_articles', None) or []
+                recommendations = analysis.pop('recommendations', None) or []
             
             # Combine all data
             result = {
-                'complaint': complaint,
+                'complaint': _decompress_row(complaint),
                 'analysis': analysis,
                 'legal_articles': articles,
                 'recommendations': recommendations
@@ -293,27 +559,16 @@ class DatabaseManager:
             print(f"✗ Error getting complete complaint data: {e}")
             return None
     
+    def ping(self) -> bool:
+        """Run a minimal query so the Supabase connection is established"""
+        self.client.table('complaints').select('id').limit(1).execute()
+        return True
+    
     def get_statistics(self) -> Dict[str, Any]:
-        """Get dashboard statistics"""
+        """Get dashboard statistics (computed in one get_dashboard_stats call)"""
         try:
-            # Total complaints
-            total_complaints = self.client.table('complaints').select("*", count='exact').execute()
-            
-            # By status
-            pending = self.client.table('complaints').select("*", count='exact').eq('status', 'pending').execute()
-            analyzed = self.client.table('complaints').select("*", count='exact').eq('status', 'analyzed').execute()
-            
-            # By urgency
-            high_urgency = self.client.table('analysis_results').select("*", count='exact').eq('tingkat_urgensi', 'Tinggi').execute()
-            
-            stats = {
-                'total_complaints': total_complaints.count,
-                'pending': pending.count,
-                'analyzed': analyzed.count,
-                'high_urgency': high_urgency.count
-            }
-            
-            return stats
+            response = self.client.rpc('get_dashboard_stats', {}).execute()
+            return response.data or {}
             
         except Exception as e:
             print(f"✗ Error getting statistics: {e}")
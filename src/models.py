@@ -3,7 +3,7 @@ Data Models for Legal Complaint Analyzer
 """
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date, time
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from uuid import UUID
 
 class Complaint(BaseModel):
@@ -92,7 +92,7 @@ class AnalysisResult(BaseModel):
 class Recommendation(BaseModel):
     """Recommendation model"""
     id: Optional[UUID] = None
-    analysis_id: UUID
+    analysis_id: Optional[UUID] = None
     recommendation_text: str
     priority: str = 'Normal'
     category: Optional[str] = None
@@ -100,3 +100,114 @@ class Recommendation(BaseModel):
     assigned_to: Optional[str] = None
     completed_at: Optional[datetime] = None
     notes: Optional[str] = None
+
+
+# ═══════════════════════════════════════════════════════════════
+# GEMINI ANALYSIS OUTPUT
+# Mirrors the JSON structure requested in LegalAIAnalyzer's prompt.
+# Unknown keys are kept so full_analysis_json stays complete.
+# ═══════════════════════════════════════════════════════════════
+
+class _AnalysisPart(BaseModel):
+    """Base for parts of the Gemini analysis output"""
+    model_config = ConfigDict(extra='allow')
+
+class Pelapor(_AnalysisPart):
+    """Reporting party"""
+    nama: Optional[str] = None
+    ktp: Optional[str] = None
+    kontak: Optional[str] = None
+
+class Terlapor(_AnalysisPart):
+    """Reported party"""
+    nama: Optional[str] = None
+    identitas: Optional[str] = None
+    ciri: Optional[str] = None
+
+class Kejadian(_AnalysisPart):
+    """Incident details"""
+    tanggal: Optional[str] = None
+    waktu: Optional[str] = None
+    lokasi: Optional[str] = None
+    provinsi: Optional[str] = None
+
+class Kerugian(_AnalysisPart):
+    """Losses"""
+    materil: Optional[float] = None
+    immateril: Optional[str] = None
+
+class Bukti(_AnalysisPart):
+    """Evidence"""
+    fisik: Optional[List[str]] = None
+    dokumen: Optional[List[str]] = None
+    saksi: Optional[List[str]] = None
+    digital: Optional[List[str]] = None
+
+class PasalAnalysis(_AnalysisPart):
+    """Legal article identified by the AI"""
+    pasal_number: Optional[str] = None
+    sumber_hukum: Optional[str] = None
+    judul_pasal: Optional[str] = None
+    bunyi_pasal: Optional[str] = None
+    elemen_konstitutif: Optional[List[str]] = None
+    elemen_terpenuhi: Optional[List[Dict[str, Any]]] = None
+    confidence_score: float = 0.5
+    confidence_level: str = 'Sedang'
+    reasoning: Optional[str] = None
+    alasan: Optional[str] = None
+    is_primary: Optional[bool] = None
+    article_type: Optional[str] = None
+
+class AnalysisSummary(_AnalysisPart):
+    """Executive summary and urgency"""
+    executive_summary: Optional[str] = None
+    key_points: Optional[List[str]] = None
+    tingkat_urgensi: Optional[str] = None
+    alasan_urgensi: Optional[str] = None
+    missing_information: Optional[List[str]] = None
+
+class AnalysisQuality(_AnalysisPart):
+    """Report quality assessment"""
+    kelengkapan_laporan: Optional[str] = None
+    kualitas_bukti: Optional[str] = None
+    kompleksitas_kasus: Optional[str] = None
+
+class RecommendationItem(_AnalysisPart):
+    """Follow-up recommendation suggested by the AI"""
+    text: Optional[str] = None
+    priority: Optional[str] = 'Normal'
+    category: Optional[str] = None
+
+class GeminiAnalysis(_AnalysisPart):
+    """Complete analysis returned by LegalAIAnalyzer"""
+    model_config = ConfigDict(extra='allow', populate_by_name=True)
+    
+    pelapor: Pelapor = Field(default_factory=Pelapor)
+    terlapor: Terlapor = Field(default_factory=Terlapor)
+    kejadian: Kejadian = Field(default_factory=Kejadian)
+    kronologi: Optional[str] = None
+    jenis_kasus: Optional[str] = None
+    kerugian: Kerugian = Field(default_factory=Kerugian)
+    bukti: Bukti = Field(default_factory=Bukti)
+    pasal_utama: List[PasalAnalysis] = Field(default_factory=list)
+    pasal_alternatif: List[PasalAnalysis] = Field(default_factory=list)
+    summary: AnalysisSummary = Field(default_factory=AnalysisSummary)
+    quality: AnalysisQuality = Field(default_factory=AnalysisQuality)
+    recommendations: List[RecommendationItem] = Field(default_factory=list)
+    metadata: Dict[str, Any] = Field(default_factory=dict, alias='_metadata')
+    
+    @field_validator('pelapor', 'terlapor', 'kejadian', 'kerugian', 'bukti',
+                     'summary', 'quality', mode='before')
+    @classmethod
+    def _null_as_empty_part(cls, value: Any) -> Any:
+        """Gemini is told to use null for missing data"""
+        return {} if value is None else value
+    
+    @field_validator('pasal_utama', 'pasal_alternatif', 'recommendations', mode='before')
+    @classmethod
+    def _null_as_empty_list(cls, value: Any) -> Any:
+        return [] if value is None else value
+    
+    def to_json_dict(self) -> Dict[str, Any]:
+        """JSON-compatible dict (as stored in full_analysis_json)"""
+        return self.model_dump(mode='json', by_alias=True, exclude_unset=True)
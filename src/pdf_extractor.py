@@ -3,59 +3,347 @@ PDF Extraction Module
 Handles extraction of text from PDF files using PyMuPDF and OCR
 """
 import os
-from typing import Optional
+import asyncio
+import hashlib
+import queue
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
 import fitz  # PyMuPDF
 import pytesseract
-from pdf2image import convert_from_path
 from PIL import Image
 
 
+# Documents with more pages than this are extracted in worker processes
+PARALLEL_PAGE_THRESHOLD = 8
+
+# Upper bound on page-extraction worker processes
+MAX_PAGE_WORKERS = 8
+
+# Worker pool shared by all extractions in this process (created on first use)
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+# PyMuPDF does not support multithreading, and the server extracts in worker
+# threads, so every MuPDF call in this process holds this lock. OCR runs
+# after the pages are rendered and does not hold it.
+_mupdf_lock = threading.Lock()
+
+# Rasterization resolution for OCR
+OCR_DPI = 200
+
+# Pages with less embedded text than this are treated as scans and OCR'd
+MIN_PAGE_TEXT_CHARS = 50
+
+# Pages are OCR'd in parallel, so each tesseract process should use one core
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# tesserocr runs Tesseract in-process (no subprocess or temp PNG per page);
+# without it OCR falls back to the tesseract CLI via pytesseract
+try:
+    from tesserocr import PyTessBaseAPI
+except ImportError:
+    PyTessBaseAPI = None
+
+# OCR threads per _ocr_images call. Page-pool workers lower this (see
+# _init_page_worker) so the pool as a whole stays within the CPU count.
+_ocr_threads = os.cpu_count() or 1
+
+# Idle tesserocr engines per language. Loading traineddata is slow, so engines
+# are reused across pages and documents; each is used by one thread at a time.
+_tess_pool: Dict[str, "queue.SimpleQueue"] = {}
+
+# Extracted texts kept in memory, keyed by SHA-256 of the PDF bytes
+EXTRACTION_CACHE_SIZE = 32
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _ocr_image(image: Image.Image, language: str) -> str:
+    """OCR one page image, with a pooled tesserocr engine when available"""
+    if PyTessBaseAPI is None:
+        return pytesseract.image_to_string(image, lang=language)
+    
+    idle = _tess_pool.setdefault(language, queue.SimpleQueue())
+    try:
+        api = idle.get_nowait()
+    except queue.Empty:
+        api = PyTessBaseAPI(lang=language)
+    
+    try:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+    finally:
+        idle.put(api)
+
+
+def _ocr_images(images: List[Image.Image], language: str) -> List[str]:
+    """
+    OCR page images concurrently, preserving order
+    
+    pytesseract runs a tesseract process per call and tesserocr releases the
+    GIL while recognizing, so threads are enough to keep every core busy.
+    """
+    workers = min(_ocr_threads, len(images)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda image: _ocr_image(image, language), images))
+
+
+def _render_page(page: fitz.Page) -> Image.Image:
+    """Rasterize a page with MuPDF for OCR"""
+    pix = page.get_pixmap(dpi=OCR_DPI)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def _read_pages(doc: fitz.Document, start: int, end: int,
+                ocr_language: Optional[str] = None) -> Tuple[List[str], List[int], List[Image.Image]]:
+    """
+    Text of pages [start, end) of an open document, plus renders for OCR
+    
+    The caller must hold _mupdf_lock. With ocr_language set, pages with
+    almost no embedded text (scans inside an otherwise digital PDF) are
+    rasterized so _ocr_sparse_pages can OCR them once the lock is released.
+    
+    Returns:
+        (texts, sparse, images): page texts, indexes of the sparse pages and
+        their rendered images
+    """
+    texts = [doc[page_num].get_text("text") for page_num in range(start, end)]
+    sparse: List[int] = []
+    images: List[Image.Image] = []
+    
+    if ocr_language:
+        sparse = [i for i, text in enumerate(texts) if len(text.strip()) < MIN_PAGE_TEXT_CHARS]
+        try:
+            images = [_render_page(doc[start + i]) for i in sparse]
+        except Exception as e:
+            print(f"    ⚠ OCR of scanned pages failed: {e}")
+            sparse = []
+    
+    return texts, sparse, images
+
+
+def _ocr_sparse_pages(texts: List[str], sparse: List[int], images: List[Image.Image],
+                      ocr_language: Optional[str] = None) -> List[str]:
+    """Replace the text of sparse pages with their OCR text where it is longer"""
+    if sparse:
+        try:
+            for i, ocr_text in zip(sparse, _ocr_images(images, ocr_language)):
+                if len(ocr_text.strip()) > len(texts[i].strip()):
+                    texts[i] = ocr_text
+        except Exception as e:
+            print(f"    ⚠ OCR of scanned pages failed: {e}")
+    
+    return texts
+
+
+def _page_texts(doc: fitz.Document, start: int, end: int,
+                ocr_language: Optional[str] = None) -> List[str]:
+    """
+    Text of pages [start, end) of an open document
+    
+    With ocr_language set, pages with almost no embedded text are OCR'd
+    individually (see _read_pages).
+    """
+    with _mupdf_lock:
+        pending = _read_pages(doc, start, end, ocr_language)
+    return _ocr_sparse_pages(*pending, ocr_language)
+
+
+def _extract_pages(pdf_path: str, start: int, end: int,
+                   ocr_language: Optional[str] = None) -> List[str]:
+    """
+    Extract the text of pages [start, end) of a PDF
+    
+    Top-level so it can run in a worker process; each worker opens its own
+    document handle because fitz documents cannot be shared across processes.
+    """
+    with _mupdf_lock, fitz.open(pdf_path) as doc:
+        pending = _read_pages(doc, start, end, ocr_language)
+    return _ocr_sparse_pages(*pending, ocr_language)
+
+
+def _init_page_worker(pool_workers: int) -> None:
+    """Share the CPUs between page-pool workers instead of cpu_count OCR threads each"""
+    global _ocr_threads
+    _ocr_threads = max(1, (os.cpu_count() or 1) // pool_workers)
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared page-extraction pool, starting it on first use
+    
+    Worker processes are expensive to spawn (each re-imports fitz), so one
+    pool is kept for the life of the process instead of one per document.
+    """
+    global _page_pool
+    
+    with _page_pool_lock:
+        if _page_pool is None:
+            # 'spawn' avoids forking a process that holds gRPC/HTTP threads
+            pool_workers = min(MAX_PAGE_WORKERS, os.cpu_count() or 1)
+            _page_pool = ProcessPoolExecutor(
+                max_workers=pool_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_page_worker,
+                initargs=(pool_workers,)
+            )
+        return _page_pool
+
+
+def _reset_page_pool() -> None:
+    """Drop a pool whose workers died so the next call starts a fresh one"""
+    global _page_pool
+    
+    with _page_pool_lock:
+        if _page_pool is not None:
+            _page_pool.shutdown(wait=False, cancel_futures=True)
+            _page_pool = None
+
+
+def _limit_pages(page_count: int, pages_to_extract: Optional[int]) -> int:
+    """Number of pages to process given an optional page limit"""
+    if pages_to_extract is None:
+        return page_count
+    return min(page_count, pages_to_extract)
+
+
 class PDFExtractor:
     """Handles PDF text extraction with multiple strategies"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = EXTRACTION_CACHE_SIZE):
+        """
+        Initialize extractor
+        
+        Args:
+            cache_size: Number of extracted texts to keep for re-uploads of
+                the same file (0 disables the cache)
+        """
         self.min_text_threshold = 100  # Minimum characters for digital extraction
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, Optional[int]], str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
-    def extract_text_digital(self, pdf_path: str) -> Optional[str]:
+    def extract_text_digital(self, pdf_path: str, pages_to_extract: Optional[int] = None,
+                             ocr_language: Optional[str] = None) -> Tuple[Optional[str], bool]:
         """
         Extract text from digital PDF using PyMuPDF
         
         Args:
             pdf_path: Path to PDF file
+            pages_to_extract: Only extract the first N pages (default: all)
+            ocr_language: If set, pages without embedded text are OCR'd in
+                this language instead of being left empty
             
         Returns:
-            Extracted text or None if failed
+            (text, is_sufficient): the extracted text (None if extraction
+            failed) and whether it reaches min_text_threshold
         """
         try:
             print(f"  → Trying digital extraction (PyMuPDF)...")
-            doc = fitz.open(pdf_path)
-            text = ""
+            # Each call opens its own handle: documents are never shared
+            # between requests, and a temp file's handle closes with it
+            pending = None
+            with _mupdf_lock, fitz.open(pdf_path) as doc:
+                page_count = _limit_pages(len(doc), pages_to_extract)
+                if page_count <= PARALLEL_PAGE_THRESHOLD:
+                    pending = _read_pages(doc, 0, page_count, ocr_language)
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text += page.get_text()
-                print(f"    Page {page_num + 1}/{len(doc)}: {len(page.get_text())} chars")
+            if pending is not None:
+                page_texts = _ocr_sparse_pages(*pending, ocr_language)
+            else:
+                page_texts = self._extract_pages_parallel(pdf_path, page_count, ocr_language)
             
-            doc.close()
+            for page_num, page_text in enumerate(page_texts):
+                print(f"    Page {page_num + 1}/{page_count}: {len(page_text)} chars")
             
-            if len(text.strip()) >= self.min_text_threshold:
+            text = "".join(page_texts).strip()
+            
+            if len(text) >= self.min_text_threshold:
                 print(f"  ✓ Digital extraction successful: {len(text)} characters")
-                return text.strip()
-            else:
-                print(f"  ⚠ Digital extraction yielded minimal text: {len(text)} chars")
-                return None
+                return text, True
+            
+            print(f"  ⚠ Digital extraction yielded minimal text: {len(text)} chars")
+            return text, False
                 
         except Exception as e:
             print(f"  ✗ Error in digital extraction: {e}")
-            return None
+            return None, False
     
-    def extract_text_ocr(self, pdf_path: str, language: str = 'ind') -> Optional[str]:
+    def iter_pages(self, pdf_path: str, pages_to_extract: Optional[int] = None,
+                   ocr_language: Optional[str] = None) -> Iterator[str]:
+        """
+        Yield the text of each page in order, one page at a time
+        
+        Unlike extract_text_digital the whole document is never held in
+        memory, so callers can stream pages onward as they are read. Pages are
+        processed sequentially in this process.
+        
+        Args:
+            pdf_path: Path to PDF file
+            pages_to_extract: Only extract the first N pages (default: all)
+            ocr_language: If set, pages without embedded text are OCR'd in
+                this language instead of being yielded (nearly) empty
+            
+        Yields:
+            Page texts
+        """
+        with _mupdf_lock:
+            doc = fitz.open(pdf_path)
+            page_count = _limit_pages(len(doc), pages_to_extract)
+        try:
+            for page_num in range(page_count):
+                yield _page_texts(doc, page_num, page_num + 1, ocr_language)[0]
+        finally:
+            with _mupdf_lock:
+                doc.close()
+    
+    def _extract_pages_parallel(self, pdf_path: str, page_count: int,
+                                ocr_language: Optional[str] = None) -> List[str]:
+        """
+        Extract page text across CPU cores, preserving page order
+        
+        Args:
+            pdf_path: Path to PDF file
+            page_count: Number of pages to extract
+            ocr_language: OCR language for pages without embedded text
+            
+        Returns:
+            List of page texts
+        """
+        workers = min(MAX_PAGE_WORKERS, os.cpu_count() or 1, page_count)
+        if workers < 2:
+            return _extract_pages(pdf_path, 0, page_count, ocr_language)
+        
+        step = -(-page_count // workers)  # ceil division
+        starts = list(range(0, page_count, step))
+        ends = [min(start + step, page_count) for start in starts]
+        
+        try:
+            chunks = _get_page_pool().map(
+                _extract_pages, [pdf_path] * len(starts), starts, ends, [ocr_language] * len(starts)
+            )
+            return [page_text for chunk in chunks for page_text in chunk]
+        except BrokenProcessPool as e:
+            _reset_page_pool()
+            print(f"    ⚠ Parallel extraction failed ({e}), extracting sequentially")
+            return _extract_pages(pdf_path, 0, page_count, ocr_language)
+        except OSError as e:
+            # Some serverless runtimes (no /dev/shm) cannot start worker processes
+            print(f"    ⚠ Parallel extraction unavailable ({e}), extracting sequentially")
+            return _extract_pages(pdf_path, 0, page_count, ocr_language)
+    
+    def extract_text_ocr(self, pdf_path: str, language: str = 'ind',
+                         pages_to_extract: Optional[int] = None) -> Optional[str]:
         """
         Extract text from scanned PDF using OCR (Tesseract)
         
         Args:
             pdf_path: Path to PDF file
             language: Language code for OCR (default: 'ind' for Indonesian)
+            pages_to_extract: Only extract the first N pages (default: all)
             
         Returns:
             Extracted text or None if failed
@@ -63,17 +351,19 @@ class PDFExtractor:
         try:
             print(f"  → Trying OCR extraction (Tesseract)...")
             
-            # Convert PDF to images
-            images = convert_from_path(pdf_path)
-            text = ""
+            # Rasterize in-process with MuPDF instead of spawning pdftoppm
+            with _mupdf_lock, fitz.open(pdf_path) as doc:
+                page_count = _limit_pages(len(doc), pages_to_extract)
+                images = [_render_page(doc[page_num]) for page_num in range(page_count)]
             
-            # OCR each page
-            for i, image in enumerate(images):
-                print(f"    Processing page {i+1}/{len(images)} with OCR...")
-                page_text = pytesseract.image_to_string(image, lang=language)
-                text += page_text + "\n\n"
+            print(f"    Processing {len(images)} page(s) with OCR...")
+            page_texts = _ocr_images(images, language)
+            
+            for i, page_text in enumerate(page_texts):
                 print(f"    Page {i+1}: {len(page_text)} chars extracted")
             
+            text = "".join(page_text + "\n\n" for page_text in page_texts)
+            
             if len(text.strip()) >= self.min_text_threshold:
                 print(f"  ✓ OCR extraction successful: {len(text)} characters")
                 return text.strip()
@@ -85,12 +375,14 @@ class PDFExtractor:
             print(f"  ✗ Error in OCR extraction: {e}")
             return None
     
-    def extract_text(self, pdf_path: str) -> Optional[str]:
+    def extract_text(self, pdf_path: str, pages_to_extract: Optional[int] = None) -> Optional[str]:
         """
-        Smart extraction: Try digital first, fallback to OCR
+        Smart extraction: digital text where the PDF has it, OCR for scanned pages
         
         Args:
             pdf_path: Path to PDF file
+            pages_to_extract: Only extract the first N pages (default: all),
+                useful to short-circuit very long PDFs
             
         Returns:
             Extracted text or None if all methods failed
@@ -101,21 +393,72 @@ class PDFExtractor:
             print(f"✗ File not found: {pdf_path}")
             return None
         
-        # Try digital extraction first
-        text = self.extract_text_digital(pdf_path)
+        cache_key = None
+        if self.cache_size > 0:
+            cache_key = (self._file_hash(pdf_path), pages_to_extract)
+            with self._cache_lock:
+                cached = self._cache.get(cache_key)
+                if cached is not None:
+                    self._cache.move_to_end(cache_key)
+            if cached is not None:
+                print(f"  ✓ Reusing cached extraction: {len(cached)} characters")
+                return cached
+        
+        # Digital text per page; only pages without embedded text go to OCR
+        text, is_sufficient = self.extract_text_digital(pdf_path, pages_to_extract, ocr_language='ind')
         
-        if text and len(text.strip()) >= self.min_text_threshold:
-            return text
+        if not is_sufficient:
+            print("✗ All extraction methods failed")
+            return None
+        
+        if cache_key:
+            with self._cache_lock:
+                self._cache[cache_key] = text
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
         
-        # Fallback to OCR if digital extraction failed or yielded little text
-        print("  → Digital extraction insufficient, falling back to OCR...")
-        text = self.extract_text_ocr(pdf_path)
+        return text
+    
+    async def extract_text_async(self, pdf_path: str,
+                                 pages_to_extract: Optional[int] = None) -> Optional[str]:
+        """
+        extract_text without blocking the event loop
         
-        if text:
-            return text
+        Runs in a worker thread, so the event loop keeps serving other
+        coroutines (Gemini, Supabase) meanwhile. MuPDF calls from concurrent
+        extractions take turns on _mupdf_lock; OCR and long PDFs, whose pages
+        go to the shared process pool, still run in parallel.
         
-        print("✗ All extraction methods failed")
-        return None
+        Args:
+            pdf_path: Path to PDF file
+            pages_to_extract: Only extract the first N pages (default: all)
+            
+        Returns:
+            Extracted text or None if all methods failed
+        """
+        return await asyncio.to_thread(self.extract_text, pdf_path, pages_to_extract)
+    
+    @staticmethod
+    def _file_hash(pdf_path: str) -> str:
+        """SHA-256 of the file contents, read in chunks"""
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def warmup(self) -> bool:
+        """Open and extract a 1-page in-memory PDF to load the MuPDF backend"""
+        with _mupdf_lock:
+            blank = fitz.open()
+            blank.new_page()
+            pdf_bytes = blank.tobytes()
+            blank.close()
+            
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            doc[0].get_text("text")
+            doc.close()
+        return True
     
     def get_pdf_info(self, pdf_path: str) -> dict:
         """
@@ -128,15 +471,13 @@ class PDFExtractor:
             Dictionary with PDF metadata
         """
         try:
-            doc = fitz.open(pdf_path)
-            info = {
-                'num_pages': len(doc),
-                'file_size': os.path.getsize(pdf_path),
-                'metadata': doc.metadata,
-                'is_encrypted': doc.is_encrypted
-            }
-            doc.close()
-            return info
+            with _mupdf_lock, fitz.open(pdf_path) as doc:
+                return {
+                    'num_pages': len(doc),
+                    'file_size': os.path.getsize(pdf_path),
+                    'metadata': doc.metadata,
+                    'is_encrypted': doc.is_encrypted
+                }
         except Exception as e:
             print(f"Error getting PDF info: {e}")
             return {}
@@ -0,0 +1,138 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled versions of the hot helpers in utils/helpers.py
+
+Build in place with `cythonize -i utils/_helpers.pyx`; helpers.py picks the
+compiled functions up when the extension is importable and falls back to its
+pure-Python versions otherwise. Results are identical to the Python versions;
+check_helpers_parity.py compares the two.
+"""
+import math
+from datetime import date, datetime
+
+from libc.math cimport fabs, isfinite, signbit
+from libc.stdio cimport snprintf
+
+cdef enum:
+    DIGITS_BUFFER = 400  # "%.0f" of the largest double is 309 digits
+    GROUPED_BUFFER = 540  # digits plus one '.' per group of three
+
+_MONTH_NAME_FORMATS = ('%d %B %Y', '%d %b %Y')
+_NUMERIC_FORMATS = ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y')
+
+
+cdef inline bint _keep_char(Py_UCS4 c):
+    """Same character class as helpers._SANITIZE_RE keeps: \w, \s, '.' and '-'"""
+    return c.isalnum() or c.isspace() or c == u'_' or c == u'.' or c == u'-'
+
+
+def sanitize_filename(str filename):
+    """Sanitize filename for safe storage (see helpers.sanitize_filename)"""
+    cdef list out = []
+    cdef Py_UCS4 c
+
+    for c in filename:
+        if c == u' ':
+            out.append(u'_')
+        elif _keep_char(c):
+            out.append(c)
+    return u''.join(out)
+
+
+def format_currency(amount):
+    """
+    Format number as Indonesian Rupiah (see helpers.format_currency)
+    
+    Only floats take the C path. ints can exceed double precision, so they
+    and other number types are formatted like the Python version.
+    """
+    if type(amount) is float:
+        return _format_double(amount)
+    if isinstance(amount, int):
+        return _group_digits(abs(amount), amount < 0)
+    if not math.isfinite(amount):
+        return f"Rp {amount:,.0f}"
+    return _group_digits(abs(round(amount)), math.copysign(1.0, amount) < 0)
+
+
+cdef str _group_digits(object value, bint negative):
+    """'Rp ' plus the digits of a non-negative int grouped with '.'"""
+    cdef str digits = str(value)
+    cdef Py_ssize_t first = len(digits) % 3 or 3
+    groups = [digits[:first]]
+    groups.extend(digits[i:i + 3] for i in range(first, len(digits), 3))
+    return ('Rp -' if negative else 'Rp ') + '.'.join(groups)
+
+
+cdef str _format_double(double amount):
+    """format_currency for a float, grouped by hand after snprintf"""
+    cdef char buf[DIGITS_BUFFER]
+    cdef char grouped[GROUPED_BUFFER]
+    cdef int n, first, i, j = 0
+
+    if not isfinite(amount):
+        return f"Rp {amount:,.0f}"
+
+    # "%.0f" rounds half to even on the exact binary value, like ",.0f"
+    n = snprintf(buf, DIGITS_BUFFER, "%.0f", fabs(amount))
+    first = n % 3 or 3
+    for i in range(n):
+        if i and (i - first) % 3 == 0:
+            grouped[j] = b'.'
+            j += 1
+        grouped[j] = buf[i]
+        j += 1
+
+    return ('Rp -' if signbit(amount) else 'Rp ') + grouped[:j].decode('ascii')
+
+
+cdef inline int _digits(str s, Py_ssize_t start, Py_ssize_t length):
+    """Integer value of s[start:start + length] if it is all ASCII digits, else -1"""
+    cdef int value = 0
+    cdef Py_UCS4 c
+    cdef Py_ssize_t i
+
+    for i in range(start, start + length):
+        c = s[i]
+        if c < u'0' or c > u'9':
+            return -1
+        value = value * 10 + (<int>c - 48)  # 48 == ord('0')
+    return value
+
+
+def parse_date(str date_string):
+    """
+    Parse various date formats to ISO format (see helpers.parse_date)
+
+    Numeric shapes are parsed directly; month-name formats go through
+    datetime.strptime so month names follow the same locale rules.
+    """
+    cdef int year = -1, month = -1, day = -1
+    cdef Py_UCS4 sep
+
+    if len(date_string) == 10:
+        if date_string[4] == u'-' and date_string[7] == u'-':
+            year = _digits(date_string, 0, 4)
+            month = _digits(date_string, 5, 2)
+            day = _digits(date_string, 8, 2)
+        else:
+            sep = date_string[2]
+            if (sep == u'-' or sep == u'/') and date_string[5] == sep:
+                day = _digits(date_string, 0, 2)
+                month = _digits(date_string, 3, 2)
+                year = _digits(date_string, 6, 4)
+
+        if year >= 0 and month >= 0 and day >= 0:
+            # No other format accepts this shape, so a bad date is final
+            try:
+                return date(year, month, day).isoformat()
+            except ValueError:
+                return None
+
+    for fmt in _NUMERIC_FORMATS + _MONTH_NAME_FORMATS:
+        try:
+            return datetime.strptime(date_string, fmt).date().isoformat()
+        except ValueError:
+            continue
+
+    return None
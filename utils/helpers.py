@@ -1,19 +1,86 @@
 """
 Helper Functions and Utilities
+
+The string/date helpers are not Numba candidates: Numba falls back to object
+mode on str-heavy code and ends up slower than plain Python. Their compiled
+path is the Cython build in utils/_helpers.pyx.
 """
 import os
 import re
-from datetime import datetime
-from typing import Optional
-from pathlib import Path
+import sys
+import math
+import secrets
+import time
+import functools
+import itertools
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# generate_complaint_number state: a process-wide sequence and the
+# timestamp prefix of the current second. The sequence starts at a random
+# point so separate worker processes do not all begin at 0000.
+_complaint_sequence = itertools.count(secrets.randbelow(10000))
+_complaint_prefix: Tuple[int, str] = (-1, '')
+_complaint_prefix_lock = threading.Lock()
+
+# Suffix truncate_text puts on shortened text
+_ELLIPSIS = '...'
+
+# Directories ensure_directory has already created or found
+_ENSURED_DIRECTORIES: Set[str] = set()
+
+# Numeric dates are dispatched on their shape (ASCII digits -> 'd'), so
+# parse_date tries the one format that can match instead of each in turn
+_DATE_SHAPE_TABLE = str.maketrans('0123456789', 'd' * 10)
+_DATE_FORMAT_BY_SHAPE = {
+    **{f'dddd-{m}-{d}': '%Y-%m-%d' for m in ('d', 'dd') for d in ('d', 'dd')},
+    **{f'{d}{sep}{m}{sep}dddd': f'%d{sep}%m{sep}%Y'
+       for sep in '-/' for d in ('d', 'dd') for m in ('d', 'dd')},
+}
+
+# Characters sanitize_filename removes; for ASCII names the removal and the
+# space-to-underscore swap are done in one str.translate pass
+_SANITIZE_RE = re.compile(r'[^\w\s.-]')
+_ASCII_SANITIZE_TABLE = {c: None for c in range(128) if _SANITIZE_RE.match(chr(c))}
+_ASCII_SANITIZE_TABLE[ord(' ')] = '_'
+
+# Formats parse_date tries for everything else
+_DATE_FORMATS = (
+    '%Y-%m-%d',
+    '%d-%m-%Y',
+    '%d/%m/%Y',
+    '%d %B %Y',
+    '%d %b %Y'
+)
 
 
 def generate_complaint_number() -> str:
     """
     Generate unique complaint number
-    Format: ADU-YYYYMMDDHHMMSS
+    Format: ADU-YYYYMMDDHHMMSS-NNNN
+    
+    The sequence suffix keeps numbers generated in the same second distinct
+    within a process; its random starting point makes a clash between
+    processes (uvicorn workers, serverless instances) unlikely but not
+    impossible. The timestamp part is formatted once per second.
     """
-    return f"ADU-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    global _complaint_prefix
+    
+    second = int(time.time())
+    bucket, prefix = _complaint_prefix
+    if bucket != second:
+        with _complaint_prefix_lock:
+            bucket, prefix = _complaint_prefix
+            if bucket != second:
+                now = datetime.fromtimestamp(second)
+                prefix = (
+                    f"ADU-{now.year:04d}{now.month:02d}{now.day:02d}"
+                    f"{now.hour:02d}{now.minute:02d}{now.second:02d}"
+                )
+                _complaint_prefix = (second, prefix)
+    
+    return f"{prefix}-{next(_complaint_sequence) % 10000:04d}"
 
 
 def sanitize_filename(filename: str) -> str:
@@ -26,21 +93,29 @@ def sanitize_filename(filename: str) -> str:
     Returns:
         Sanitized filename
     """
+    if filename.isascii():
+        return filename.translate(_ASCII_SANITIZE_TABLE)
+    
     # Remove special characters
-    filename = re.sub(r'[^\w\s.-]', '', filename)
+    filename = _SANITIZE_RE.sub('', filename)
     # Replace spaces with underscores
-    filename = filename.replace(' ', '_')
-    return filename
+    return filename.replace(' ', '_')
 
 
 def ensure_directory(directory: str) -> None:
     """
     Ensure directory exists, create if not
     
+    Each directory is checked once per process; one deleted afterwards
+    is not recreated.
+    
     Args:
         directory: Directory path
     """
-    Path(directory).mkdir(parents=True, exist_ok=True)
+    if directory in _ENSURED_DIRECTORIES:
+        return
+    os.makedirs(directory or '.', exist_ok=True)
+    _ENSURED_DIRECTORIES.add(directory)
 
 
 def format_currency(amount: float) -> str:
@@ -53,36 +128,85 @@ def format_currency(amount: float) -> str:
     Returns:
         Formatted string
     """
-    return f"Rp {amount:,.0f}".replace(',', '.')
-
-
+    # ints are formatted exactly, however large (no float conversion)
+    if isinstance(amount, int):
+        return _format_rupiah(abs(amount), amount < 0)
+    if not math.isfinite(amount):
+        return f"Rp {amount:,.0f}"
+    return _format_rupiah(abs(round(amount)), math.copysign(1.0, amount) < 0)
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_rupiah(value: int, negative: bool) -> str:
+    """Cached formatting for format_currency; the same amounts recur often"""
+    digits = str(value)
+    # Group thousands with '.' in one pass, from the leftmost partial group
+    first = len(digits) % 3 or 3
+    groups = [digits[:first]]
+    groups.extend(digits[i:i + 3] for i in range(first, len(digits), 3))
+    return ('Rp -' if negative else 'Rp ') + '.'.join(groups)
+
+
+@functools.lru_cache(maxsize=4096)
 def parse_date(date_string: str) -> Optional[str]:
     """
     Parse various date formats to ISO format (YYYY-MM-DD)
     
+    Results are memoized since the same dates recur across records
+    (parse_date.cache_clear() resets the cache).
+    
     Args:
         date_string: Date in various formats
         
     Returns:
         ISO formatted date string or None
     """
-    date_formats = [
-        '%Y-%m-%d',
-        '%d-%m-%Y',
-        '%d/%m/%Y',
-        '%d %B %Y',
-        '%d %b %Y'
-    ]
+    # Already ISO (the common case): only validate the date
+    if (len(date_string) == 10 and date_string[4] == '-' and date_string[7] == '-'
+            and date_string.isascii()):
+        year, month, day = date_string[:4], date_string[5:7], date_string[8:10]
+        if year.isdigit() and month.isdigit() and day.isdigit():
+            try:
+                return date(int(year), int(month), int(day)).isoformat()
+            except ValueError:
+                return None
+    
+    fmt = _DATE_FORMAT_BY_SHAPE.get(date_string.translate(_DATE_SHAPE_TABLE))
+    if fmt:
+        # No other format accepts this shape, so a bad date is final
+        try:
+            return datetime.strptime(date_string, fmt).date().isoformat()
+        except ValueError:
+            return None
     
-    for fmt in date_formats:
+    for fmt in _DATE_FORMATS:
         try:
-            return datetime.strptime(date_string, fmt).strftime('%Y-%m-%d')
+            return datetime.strptime(date_string, fmt).date().isoformat()
         except ValueError:
             continue
     
     return None
 
 
+def parse_date_many(date_strings: Iterable[str]) -> List[Optional[str]]:
+    """
+    Parse a batch of dates with parse_date, parsing each distinct string once
+    
+    Args:
+        date_strings: Dates in various formats
+        
+    Returns:
+        ISO formatted date strings (None where unparseable), in input order
+    """
+    parsed: Dict[str, Optional[str]] = {}
+    results = []
+    for date_string in date_strings:
+        if date_string not in parsed:
+            parsed[date_string] = parse_date(date_string)
+        results.append(parsed[date_string])
+    return results
+
+
 def truncate_text(text: str, max_length: int = 100) -> str:
     """
     Truncate text to max length
@@ -95,17 +219,35 @@ def truncate_text(text: str, max_length: int = 100) -> str:
         Truncated text with ellipsis
     """
     if len(text) <= max_length:
-        return text
-    return text[:max_length-3] + '...'
+        return text  # No copy when nothing is cut
+    return text[:max_length - len(_ELLIPSIS)] + _ELLIPSIS
+
+
+@functools.lru_cache(maxsize=32)
+def _separator(char: str, length: int) -> str:
+    """Separator line (with newline), built once per char/length"""
+    return char * length + '\n'
 
 
 def print_separator(char: str = '=', length: int = 70) -> None:
     """Print a separator line"""
-    print(char * length)
+    sys.stdout.write(_separator(char, length))
 
 
 def print_section_header(title: str) -> None:
     """Print formatted section header"""
-    print_separator()
-    print(f"  {title}")
-    print_separator()
+    separator = _separator('=', 70)
+    sys.stdout.write(f"{separator}  {title}\n{separator}")
+
+
+# Compiled versions of the hot helpers (utils/_helpers.pyx), used when the
+# extension has been built with `cythonize -i utils/_helpers.pyx`
+try:
+    from utils import _helpers
+except ImportError:
+    _helpers = None
+else:
+    # Deliberate rebinding: callers keep importing the public names
+    sanitize_filename = _helpers.sanitize_filename  # noqa: F811
+    format_currency = _helpers.format_currency  # noqa: F811
+    parse_date = functools.lru_cache(maxsize=4096)(_helpers.parse_date)  # noqa: F811